@@ -0,0 +1,156 @@
+import numpy as np
+from sqlalchemy import select
+
+from models import db, User, Assignment, Submission, Feedback
+
+
+# Teacher-side grade analytics.
+#
+# All Feedback rows in scope are fetched with one query, turned into NumPy
+# columns and summarised with array operations, so the cost is one scan plus
+# a few vectorised passes however many students are involved. Callers memoize
+# the result by data version (see the teacher analytics routes).
+
+RUBRICS = ("rubric_clarity", "rubric_completion", "rubric_presentation")
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+
+
+def _round(value, digits=2):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def fetch_feedback(assignment_id=None, teacher_id=None):
+    """One columnar fetch of graded work in scope: returns a dict of NumPy arrays."""
+    stmt = select(
+        Feedback.score,
+        Feedback.max_score,
+        Feedback.rubric_clarity,
+        Feedback.rubric_completion,
+        Feedback.rubric_presentation,
+        Submission.student_id,
+        Submission.assignment_id,
+    ).join(
+        Submission, Submission.id == Feedback.submission_id
+    ).join(
+        Assignment, Assignment.id == Submission.assignment_id
+    )
+    if assignment_id is not None:
+        stmt = stmt.where(Submission.assignment_id == assignment_id)
+    if teacher_id is not None:
+        stmt = stmt.where(Assignment.teacher_id == teacher_id)
+
+    # Plain tuples: NumPy probes Row objects as mappings, which is much slower.
+    rows = [tuple(row) for row in db.session.execute(stmt)]
+    table = np.array(rows, dtype=float).reshape(len(rows), 7)
+    score, max_score = table[:, 0], table[:, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent = np.where(max_score > 0, score / max_score * 100, np.nan)
+    return {
+        "percent": percent,
+        "rubrics": table[:, 2:5],
+        "student_id": table[:, 5].astype(np.int64),
+        "assignment_id": table[:, 6].astype(np.int64),
+    }
+
+
+def _distribution(percent):
+    counts, edges = np.histogram(np.clip(percent, 0, 100), bins=HISTOGRAM_BINS, range=(0, 100))
+    return [
+        {"low": int(low), "high": int(high), "count": int(count)}
+        for low, high, count in zip(edges[:-1], edges[1:], counts)
+    ]
+
+
+def _correlations(rubrics, percent):
+    columns = np.column_stack([rubrics, percent])
+    if len(columns) < 2:
+        return None
+    # A constant column has no defined correlation; corrcoef reports it as nan.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        matrix = np.corrcoef(columns, rowvar=False)
+    labels = [name.replace("rubric_", "") for name in RUBRICS] + ["score"]
+    return {
+        "labels": labels,
+        "matrix": [[_round(value) for value in row] for row in matrix],
+    }
+
+
+def _group_means(keys, values):
+    unique, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse)
+    means = np.bincount(inverse, weights=values) / counts
+    return unique, means, counts
+
+
+def _at_risk(student_id, percent, threshold, limit):
+    unique, means, counts = _group_means(student_id, percent)
+    flagged = np.flatnonzero(means < threshold)
+    flagged = flagged[np.argsort(means[flagged], kind="stable")][:limit]
+    if not len(flagged):
+        return []
+    rows = db.session.execute(select(User.id, User.name).where(User.id.in_(unique[flagged].tolist())))
+    names = {user_id: name for user_id, name in rows}
+    return [
+        {
+            "student_id": int(unique[i]),
+            "name": names.get(int(unique[i]), "Unknown"),
+            "mean_percent": _round(means[i]),
+            "graded": int(counts[i]),
+        }
+        for i in flagged
+    ]
+
+
+def _per_assignment(assignment_id, percent):
+    unique, means, counts = _group_means(assignment_id, percent)
+    rows = db.session.execute(select(Assignment.id, Assignment.title).where(Assignment.id.in_(unique.tolist())))
+    titles = {aid: title for aid, title in rows}
+    return [
+        {
+            "assignment_id": int(aid),
+            "title": titles.get(int(aid), ""),
+            "mean_percent": _round(mean),
+            "graded": int(count),
+        }
+        for aid, mean, count in zip(unique, means, counts)
+    ]
+
+
+def grade_analytics(assignment_id=None, teacher_id=None, at_risk_percent=50.0, at_risk_limit=25):
+    """Summary statistics for the grades in scope, as JSON-serialisable Python values.
+
+    Rows whose max_score is 0 are left out of the score statistics.
+    """
+    data = fetch_feedback(assignment_id=assignment_id, teacher_id=teacher_id)
+    valid = ~np.isnan(data["percent"])
+    percent = data["percent"][valid]
+    rubrics = data["rubrics"][valid]
+
+    result = {"graded": int(valid.sum()), "students": int(len(np.unique(data["student_id"][valid])))}
+    if not len(percent):
+        return result
+
+    result["score"] = {
+        "mean": _round(percent.mean()),
+        "std": _round(percent.std()),
+        "min": _round(percent.min()),
+        "max": _round(percent.max()),
+        "percentiles": {
+            str(p): _round(value) for p, value in zip(PERCENTILES, np.percentile(percent, PERCENTILES))
+        },
+    }
+    result["distribution"] = _distribution(percent)
+    result["rubrics"] = {
+        name.replace("rubric_", ""): {
+            "mean": _round(rubrics[:, i].mean()),
+            "counts": np.bincount(rubrics[:, i].astype(np.int64), minlength=6)[1:6].tolist(),
+        }
+        for i, name in enumerate(RUBRICS)
+    }
+    result["correlations"] = _correlations(rubrics, percent)
+    result["at_risk"] = _at_risk(data["student_id"][valid], percent, at_risk_percent, at_risk_limit)
+    if assignment_id is None:
+        result["assignments"] = _per_assignment(data["assignment_id"][valid], percent)
+    return result
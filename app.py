@@ -1,34 +1,86 @@
+import csv
+import io
+import json
+import mimetypes
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from functools import wraps
 
+import click
 from flask import (
     Flask,
+    Response,
+    abort,
     render_template,
     request,
     redirect,
     url_for,
     flash,
+    make_response,
     session,
+    stream_with_context,
+    send_file,
     send_from_directory,
 )
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from markupsafe import Markup
 from werkzeug.utils import secure_filename
 
+from analytics import grade_analytics
+from cache import FragmentCache, create_backend, templates_fingerprint
 from config import Config
-from models import db, User, Assignment, Submission, Feedback
+from database import install_sqlite_pragmas
+from models import (
+    db, User, Assignment, Submission, Feedback, Job, RosterImport, StudentGradeRollup, AssignmentGradeRollup,
+)
+from export import EXPORT_FORMATS, stream_gradebook
+from grading import GRADE_FIELDS, GradeError, apply_grades, parse_grade
+from jobs import enqueue as enqueue_job
+from metrics import install_instrumentation, render_metrics
+from migrations import upgrade as upgrade_schema
+from passwords import HasherBusy, PasswordHasher
+from plagiarism import rebuild_index
+from rollups import record_feedback_change, rebuild_rollups
+from roster import ROSTER_FIELDS, expire_roster_uploads, import_roster, save_roster_upload
+from search import SEARCH_KINDS, rebuild_search_index, search, search_available
+from similarity import compute_similarity, similarity_overview
+from storage import store_upload, release_blob, blob_key, blob_path, collect_garbage
+from versions import GLOBAL_ASSIGNMENTS, current_versions, student_scope, teacher_scope
 
 
 ALLOWED_EXTENSIONS = {"pdf", "png", "jpg", "jpeg", "gif"}
 
+DASHBOARD_VIEWS = {
+    "upcoming": "Upcoming",
+    "recent": "Recently due",
+    "overdue": "Overdue, not submitted",
+}
+
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     db.init_app(app)
+    with app.app_context():
+        install_sqlite_pragmas(db.engine, app.config)
+        if app.config["METRICS_ENABLED"]:
+            install_instrumentation(app, db.engine)
 
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
+    app.extensions["fragment_cache"] = FragmentCache(
+        create_backend(app.config),
+        prefix=f"{app.config['CACHE_KEY_PREFIX']}:{templates_fingerprint(os.path.join(app.root_path, app.template_folder))}",
+    )
+    app.extensions["password_hasher"] = PasswordHasher(
+        app.config["PASSWORD_HASH_METHOD"],
+        workers=app.config["PASSWORD_HASH_WORKERS"],
+        max_pending=app.config["PASSWORD_HASH_MAX_PENDING"],
+    )
+
     @app.context_processor
     def inject_now():
         return {"now": datetime.utcnow()}
@@ -36,6 +88,18 @@ def create_app():
     def allowed_file(filename):
         return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
+    def format_cursor(timestamp, row_id):
+        return f"{timestamp.isoformat()}_{row_id}"
+
+    def parse_cursor(value):
+        if not value:
+            return None
+        try:
+            timestamp, row_id = value.rsplit("_", 1)
+            return datetime.fromisoformat(timestamp), int(row_id)
+        except ValueError:
+            return None
+
     def login_required(role=None):
         def decorator(f):
             @wraps(f)
@@ -50,6 +114,33 @@ def create_app():
             return wrapper
         return decorator
 
+    def cached_page(template, page, scopes, build, **context):
+        """Render template around cached fragments, or answer 304 if the client's copy is current.
+
+        build() is only called on a cache miss; see FragmentCache.get_or_build.
+        """
+        fragment_cache = app.extensions["fragment_cache"]
+        key = fragment_cache.key(page, session["user_id"], current_versions(scopes))
+        entry = fragment_cache.get_or_build(key, build)
+        etag = fragment_cache.etag(key, entry, session.get("user_name"), datetime.utcnow().year)
+
+        # Pending flash messages are part of the page, so never answer 304 over them.
+        if "_flashes" not in session and etag in request.if_none_match:
+            response = app.response_class(status=304)
+        else:
+            fragments = {name: Markup(html) for name, html in entry["fragments"].items()}
+            response = make_response(render_template(template, **fragments, **context))
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add("Cookie")
+        return response
+
+    def server_busy(template):
+        flash("The server is busy. Please try again in a few seconds.", "warning")
+        retry_after = app.config["LOGIN_RETRY_AFTER_SECONDS"]
+        return render_template(template), 503, {"Retry-After": str(retry_after)}
+
     @app.route("/")
     def index():
         if "user_id" in session:
@@ -77,10 +168,16 @@ def create_app():
                 flash("Email already registered. Please log in.", "warning")
                 return redirect(url_for("login"))
 
+            db.session.rollback()  # see login()
+            try:
+                password_hash = app.extensions["password_hasher"].hash(password)
+            except HasherBusy:
+                return server_busy("register.html")
+
             user = User(
                 name=name,
                 email=email,
-                password_hash=generate_password_hash(password),
+                password_hash=password_hash,
                 role=role,
             )
             db.session.add(user)
@@ -96,11 +193,27 @@ def create_app():
             email = request.form.get("email", "").strip().lower()
             password = request.form.get("password", "")
 
-            user = User.query.filter_by(email=email).first()
-            if not user or not check_password_hash(user.password_hash, password):
+            user = db.session.query(User.id, User.name, User.role, User.password_hash).filter_by(email=email).first()
+            # Release the connection (and the read snapshot) while the hash is
+            # checked: during a login burst requests may wait for the hasher.
+            db.session.rollback()
+
+            hasher = app.extensions["password_hasher"]
+            try:
+                valid = user is not None and hasher.verify(user.password_hash, password)
+            except HasherBusy:
+                return server_busy("login.html")
+            if not valid:
                 flash("Invalid email or password.", "danger")
                 return render_template("login.html")
 
+            if hasher.needs_rehash(user.password_hash):
+                try:
+                    User.query.filter_by(id=user.id).update({"password_hash": hasher.hash(password)})
+                    db.session.commit()
+                except HasherBusy:
+                    pass  # upgraded on a later login
+
             session["user_id"] = user.id
             session["user_name"] = user.name
             session["role"] = user.role
@@ -124,23 +237,40 @@ def create_app():
     @login_required(role="teacher")
     def teacher_dashboard():
         teacher_id = session["user_id"]
-        assignments = Assignment.query.filter_by(teacher_id=teacher_id).order_by(Assignment.created_at.desc()).all()
 
-        total_assignments = len(assignments)
-        total_submissions = Submission.query.join(Assignment).filter(Assignment.teacher_id == teacher_id).count()
-        graded_submissions = Submission.query.join(Assignment).filter(
-            Assignment.teacher_id == teacher_id, Submission.status == "graded"
-        ).count()
-        pending_submissions = total_submissions - graded_submissions
+        def build():
+            graded = case((Submission.status == "graded", 1), else_=0)
+            # One rollup row per assignment, so max() just carries its value through the GROUP BY.
+            average = case((
+                AssignmentGradeRollup.total_max > 0,
+                100.0 * AssignmentGradeRollup.total_score / AssignmentGradeRollup.total_max,
+            ))
+            assignments = db.session.query(
+                Assignment,
+                func.count(Submission.id).label("submission_count"),
+                func.coalesce(func.sum(graded), 0).label("graded_count"),
+                func.max(average).label("average_percent"),
+            ).outerjoin(
+                Submission, Submission.assignment_id == Assignment.id
+            ).outerjoin(
+                AssignmentGradeRollup, AssignmentGradeRollup.assignment_id == Assignment.id
+            ).filter(
+                Assignment.teacher_id == teacher_id
+            ).group_by(Assignment.id).order_by(Assignment.created_at.desc()).all()
+
+            total_submissions = sum(row.submission_count for row in assignments)
+            graded_submissions = sum(row.graded_count for row in assignments)
+            stats = render_template(
+                "fragments/teacher_stats.html",
+                total_assignments=len(assignments),
+                total_submissions=total_submissions,
+                graded_submissions=graded_submissions,
+                pending_submissions=total_submissions - graded_submissions,
+            )
+            table = render_template("fragments/teacher_assignments.html", assignments=assignments)
+            return {"stats": stats, "assignments_table": table}, None
 
-        return render_template(
-            "teacher_dashboard.html",
-            assignments=assignments,
-            total_assignments=total_assignments,
-            total_submissions=total_submissions,
-            graded_submissions=graded_submissions,
-            pending_submissions=pending_submissions,
-        )
+        return cached_page("teacher_dashboard.html", "teacher_dashboard", [teacher_scope(teacher_id)], build)
 
     @app.route("/teacher/assignments/new", methods=["GET", "POST"])
     @login_required(role="teacher")
@@ -181,13 +311,76 @@ def create_app():
             flash("You do not have permission to view this assignment.", "danger")
             return redirect(url_for("teacher_dashboard"))
 
-        submissions = Submission.query.filter_by(assignment_id=assignment.id).all()
+        status = request.args.get("status", "all")
+        order = request.args.get("order", "newest")
+        if status not in {"all", "submitted", "graded"}:
+            status = "all"
+        if order not in {"newest", "oldest"}:
+            order = "newest"
+        try:
+            min_plagiarism = float(request.args["min_plagiarism"]) if request.args.get("min_plagiarism") else None
+        except ValueError:
+            min_plagiarism = None
+        cursor = parse_cursor(request.args.get("after"))
+
+        query = Submission.query.options(
+            joinedload(Submission.student),
+            joinedload(Submission.feedback),
+        ).filter(Submission.assignment_id == assignment.id)
+
+        if status != "all":
+            query = query.filter(Submission.status == status)
+        if min_plagiarism is not None:
+            query = query.filter(Submission.plagiarism_score >= min_plagiarism)
+
+        # Keyset pagination on (submitted_at, id): each page is an index range
+        # scan, no matter how deep into the list it is.
+        if order == "newest":
+            if cursor:
+                query = query.filter(or_(
+                    Submission.submitted_at < cursor[0],
+                    and_(Submission.submitted_at == cursor[0], Submission.id < cursor[1]),
+                ))
+            query = query.order_by(Submission.submitted_at.desc(), Submission.id.desc())
+        else:
+            if cursor:
+                query = query.filter(or_(
+                    Submission.submitted_at > cursor[0],
+                    and_(Submission.submitted_at == cursor[0], Submission.id > cursor[1]),
+                ))
+            query = query.order_by(Submission.submitted_at.asc(), Submission.id.asc())
+
+        page_size = app.config["SUBMISSIONS_PAGE_SIZE"]
+        submissions = query.limit(page_size + 1).all()
+        next_cursor = None
+        if len(submissions) > page_size:
+            submissions = submissions[:page_size]
+            last = submissions[-1]
+            next_cursor = format_cursor(last.submitted_at, last.id)
+
         return render_template(
             "assignment_detail.html",
             assignment=assignment,
             submissions=submissions,
+            filters={"status": status, "order": order, "min_plagiarism": min_plagiarism},
+            is_first_page=cursor is None,
+            next_cursor=next_cursor,
+            similarity=similarity_overview(assignment.id, [s.id for s in submissions]),
         )
 
+    @app.route("/teacher/assignments/<int:assignment_id>/similarity", methods=["POST"])
+    @login_required(role="teacher")
+    def request_similarity(assignment_id):
+        assignment = Assignment.query.get_or_404(assignment_id)
+        if assignment.teacher_id != session["user_id"]:
+            flash("You do not have permission to view this assignment.", "danger")
+            return redirect(url_for("teacher_dashboard"))
+
+        enqueue_job("similarity", assignment.id, group_key=f"assignment:{assignment.id}")
+        db.session.commit()
+        flash("Similarity analysis queued. Refresh this page in a moment.", "info")
+        return redirect(url_for("view_assignment", assignment_id=assignment.id))
+
     @app.route("/teacher/submissions/<int:submission_id>", methods=["GET", "POST"])
     @login_required(role="teacher")
     def review_submission(submission_id):
@@ -198,42 +391,31 @@ def create_app():
 
         if request.method == "POST":
             try:
-                score = float(request.form.get("score", "0"))
-                max_score = float(request.form.get("max_score", "100"))
-                rubric_clarity = int(request.form.get("rubric_clarity", "3"))
-                rubric_completion = int(request.form.get("rubric_completion", "3"))
-                rubric_presentation = int(request.form.get("rubric_presentation", "3"))
-            except ValueError:
-                flash("Please enter valid numeric values for scores and rubrics.", "danger")
-                return render_template("review_submission.html", submission=submission)
-
-            comments = request.form.get("comments", "").strip()
-
-            if not (1 <= rubric_clarity <= 5 and 1 <= rubric_completion <= 5 and 1 <= rubric_presentation <= 5):
-                flash("Rubric values must be between 1 and 5.", "danger")
+                grade = parse_grade(request.form)
+            except GradeError as exc:
+                flash(str(exc), "danger")
                 return render_template("review_submission.html", submission=submission)
 
+            old_grade = None
             if submission.feedback:
                 feedback = submission.feedback
-                feedback.score = score
-                feedback.max_score = max_score
-                feedback.rubric_clarity = rubric_clarity
-                feedback.rubric_completion = rubric_completion
-                feedback.rubric_presentation = rubric_presentation
-                feedback.comments = comments
+                old_grade = (feedback.score, feedback.max_score)
+                for field, value in grade.items():
+                    setattr(feedback, field, value)
             else:
                 feedback = Feedback(
                     submission_id=submission.id,
                     teacher_id=session["user_id"],
-                    score=score,
-                    max_score=max_score,
-                    rubric_clarity=rubric_clarity,
-                    rubric_completion=rubric_completion,
-                    rubric_presentation=rubric_presentation,
-                    comments=comments,
+                    **grade,
                 )
                 db.session.add(feedback)
 
+            record_feedback_change(
+                submission.student_id,
+                submission.assignment_id,
+                old=old_grade,
+                new=(grade["score"], grade["max_score"]),
+            )
             submission.status = "graded"
             db.session.commit()
             flash("Feedback saved successfully.", "success")
@@ -241,21 +423,272 @@ def create_app():
 
         return render_template("review_submission.html", submission=submission)
 
+    @app.route("/teacher/assignments/<int:assignment_id>/grade", methods=["GET", "POST"])
+    @login_required(role="teacher")
+    def bulk_grade(assignment_id):
+        assignment = Assignment.query.get_or_404(assignment_id)
+        if assignment.teacher_id != session["user_id"]:
+            if request.is_json:
+                return {"error": "You do not have permission to grade this assignment."}, 403
+            flash("You do not have permission to grade this assignment.", "danger")
+            return redirect(url_for("teacher_dashboard"))
+
+        if request.method == "POST":
+            if request.is_json:
+                payload = request.get_json(silent=True)
+                rows = payload.get("grades") if isinstance(payload, dict) else payload
+                if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+                    return {"error": "Expected a list of grade objects."}, 400
+                applied, errors = apply_grades(assignment.id, session["user_id"], rows)
+                return {"applied": applied, "errors": errors}
+
+            upload = request.files.get("csv_file")
+            if not upload or not upload.filename:
+                flash("Please choose a CSV file.", "danger")
+                return render_template("bulk_grade.html", assignment=assignment, fields=GRADE_FIELDS)
+
+            reader = csv.DictReader(io.TextIOWrapper(upload.stream, encoding="utf-8-sig"))
+            try:
+                applied, errors = apply_grades(assignment.id, session["user_id"], reader)
+            except (UnicodeDecodeError, csv.Error):
+                db.session.rollback()
+                flash("Could not read the CSV file.", "danger")
+                return render_template("bulk_grade.html", assignment=assignment, fields=GRADE_FIELDS)
+
+            flash(f"Saved {applied} grade(s); {len(errors)} row(s) had errors.", "success" if not errors else "warning")
+            return render_template(
+                "bulk_grade.html", assignment=assignment, fields=GRADE_FIELDS, applied=applied, errors=errors
+            )
+
+        return render_template("bulk_grade.html", assignment=assignment, fields=GRADE_FIELDS)
+
+    @app.route("/teacher/roster", methods=["GET", "POST"])
+    @login_required(role="teacher")
+    def import_students():
+        recent = RosterImport.query.filter_by(teacher_id=session["user_id"]).order_by(
+            RosterImport.id.desc()
+        ).limit(5).all()
+        if request.method == "POST":
+            upload = request.files.get("csv_file")
+            if not upload or not upload.filename:
+                flash("Please choose a CSV file.", "danger")
+                return render_template("roster_import.html", fields=ROSTER_FIELDS, recent=recent)
+
+            # The accounts are created by the worker (see roster.run_roster_import);
+            # hashing thousands of passwords would tie up this request for minutes.
+            try:
+                csv_text = upload.read().decode("utf-8-sig")
+                total_rows = sum(1 for _ in csv.DictReader(io.StringIO(csv_text)))
+            except (UnicodeDecodeError, csv.Error):
+                flash("Could not read the CSV file.", "danger")
+                return render_template("roster_import.html", fields=ROSTER_FIELDS, recent=recent)
+
+            roster_import = RosterImport(
+                teacher_id=session["user_id"],
+                filename=secure_filename(upload.filename) or "roster.csv",
+                total_rows=total_rows,
+            )
+            db.session.add(roster_import)
+            db.session.flush()
+            save_roster_upload(app.config["ROSTER_UPLOAD_FOLDER"], roster_import.id, csv_text)
+            enqueue_job("roster-import", roster_import.id)
+            db.session.commit()
+            flash(f"Importing {total_rows} row(s) in the background.", "info")
+            return redirect(url_for("roster_import_status", import_id=roster_import.id))
+
+        return render_template("roster_import.html", fields=ROSTER_FIELDS, recent=recent)
+
+    @app.route("/teacher/roster/<int:import_id>")
+    @login_required(role="teacher")
+    def roster_import_status(import_id):
+        roster_import = RosterImport.query.filter_by(id=import_id, teacher_id=session["user_id"]).first_or_404()
+        failed = roster_import.finished_at is None and db.session.query(Job.id).filter(
+            Job.kind == "roster-import", Job.target_id == import_id, Job.status == "failed",
+        ).first() is not None
+        response = make_response(render_template(
+            "roster_import_status.html",
+            roster_import=roster_import,
+            errors=json.loads(roster_import.errors or "[]"),
+            failed=failed,
+        ))
+        if roster_import.finished_at is None and not failed:
+            response.headers["Refresh"] = "3"
+        return response
+
+    def gradebook_response(fmt, filename, **scope):
+        if fmt not in EXPORT_FORMATS:
+            abort(404)
+        return app.response_class(
+            stream_with_context(stream_gradebook(fmt, **scope)),
+            mimetype=EXPORT_FORMATS[fmt],
+            headers={"Content-Disposition": f"attachment; filename={filename}.{fmt}"},
+        )
+
+    @app.route("/teacher/assignments/<int:assignment_id>/export.<fmt>")
+    @login_required(role="teacher")
+    def export_assignment_grades(assignment_id, fmt):
+        assignment = Assignment.query.get_or_404(assignment_id)
+        if assignment.teacher_id != session["user_id"]:
+            flash("You do not have permission to export this assignment.", "danger")
+            return redirect(url_for("teacher_dashboard"))
+        return gradebook_response(fmt, f"assignment-{assignment.id}-grades", assignment_id=assignment.id)
+
+    @app.route("/teacher/export.<fmt>")
+    @login_required(role="teacher")
+    def export_teacher_grades(fmt):
+        return gradebook_response(fmt, "gradebook", teacher_id=session["user_id"])
+
+    def analytics_page(page, title, back_url, **scope):
+        teacher_id = session["user_id"]
+
+        def build():
+            stats = grade_analytics(
+                at_risk_percent=app.config["ANALYTICS_AT_RISK_PERCENT"],
+                at_risk_limit=app.config["ANALYTICS_AT_RISK_LIMIT"],
+                **scope,
+            )
+            html = render_template(
+                "fragments/grade_analytics.html", stats=stats, at_risk_percent=app.config["ANALYTICS_AT_RISK_PERCENT"],
+            )
+            return {"analytics": html}, None
+
+        return cached_page(
+            "teacher_analytics.html", page, [teacher_scope(teacher_id)], build, title=title, back_url=back_url,
+        )
+
+    @app.route("/teacher/analytics")
+    @login_required(role="teacher")
+    def teacher_analytics():
+        return analytics_page(
+            "teacher_analytics", "All assignments", url_for("teacher_dashboard"), teacher_id=session["user_id"],
+        )
+
+    @app.route("/teacher/assignments/<int:assignment_id>/analytics")
+    @login_required(role="teacher")
+    def assignment_analytics(assignment_id):
+        assignment = Assignment.query.get_or_404(assignment_id)
+        if assignment.teacher_id != session["user_id"]:
+            flash("You do not have permission to view this assignment.", "danger")
+            return redirect(url_for("teacher_dashboard"))
+        return analytics_page(
+            f"assignment_analytics:{assignment.id}", assignment.title,
+            url_for("view_assignment", assignment_id=assignment.id), assignment_id=assignment.id,
+        )
+
+    @app.route("/teacher/search")
+    @login_required(role="teacher")
+    def teacher_search():
+        query = request.args.get("q", "").strip()
+        kind = request.args.get("kind", "")
+        if kind not in SEARCH_KINDS:
+            kind = ""
+
+        results = []
+        if query:
+            if not search_available():
+                flash("Search is not available on this database.", "warning")
+            else:
+                results = search(session["user_id"], query, kind=kind or None, limit=app.config["SEARCH_RESULTS_LIMIT"])
+
+        titles = {}
+        if results:
+            titles = dict(
+                db.session.query(Assignment.id, Assignment.title).filter(
+                    Assignment.id.in_({r["assignment_id"] for r in results})
+                )
+            )
+        return render_template(
+            "search.html", query=query, kind=kind, kinds=SEARCH_KINDS, results=results, titles=titles,
+        )
+
     # Student Views
     @app.route("/student/dashboard")
     @login_required(role="student")
     def student_dashboard():
         student_id = session["user_id"]
-        assignments = Assignment.query.order_by(Assignment.due_date.asc()).all()
+        view = request.args.get("view", "upcoming")
+        if view not in DASHBOARD_VIEWS:
+            view = "upcoming"
+        after = request.args.get("after")
+
+        def build():
+            now = datetime.utcnow()
+            recent_window = timedelta(days=app.config["DASHBOARD_RECENT_DAYS"])
+            recent_since = now - recent_window
+            cursor = parse_cursor(after)
+
+            query = db.session.query(
+                Assignment.id,
+                Assignment.title,
+                Assignment.due_date,
+                User.name.label("teacher_name"),
+                Submission.id.label("submission_id"),
+                Submission.status,
+                Feedback.score,
+                Feedback.max_score,
+            ).join(
+                User, User.id == Assignment.teacher_id
+            ).outerjoin(
+                Submission, and_(Submission.assignment_id == Assignment.id, Submission.student_id == student_id)
+            ).outerjoin(
+                Feedback, Feedback.submission_id == Submission.id
+            )
 
-        submissions = Submission.query.filter_by(student_id=student_id).all()
-        submissions_by_assignment = {s.assignment_id: s for s in submissions}
+            # Each view is a due_date range walked with keyset pagination on
+            # (due_date, id), so a page costs the same however many assignments
+            # exist.
+            if view == "upcoming":
+                query = query.filter(Assignment.due_date >= now)
+                if cursor:
+                    query = query.filter(or_(
+                        Assignment.due_date > cursor[0],
+                        and_(Assignment.due_date == cursor[0], Assignment.id > cursor[1]),
+                    ))
+                query = query.order_by(Assignment.due_date.asc(), Assignment.id.asc())
+            else:
+                if view == "recent":
+                    query = query.filter(Assignment.due_date < now, Assignment.due_date >= recent_since)
+                else:
+                    query = query.filter(Assignment.due_date < now, Submission.id.is_(None))
+                if cursor:
+                    query = query.filter(or_(
+                        Assignment.due_date < cursor[0],
+                        and_(Assignment.due_date == cursor[0], Assignment.id < cursor[1]),
+                    ))
+                query = query.order_by(Assignment.due_date.desc(), Assignment.id.desc())
+
+            page_size = app.config["DASHBOARD_PAGE_SIZE"]
+            rows = query.limit(page_size + 1).all()
+            next_cursor = None
+            if len(rows) > page_size:
+                rows = rows[:page_size]
+                next_cursor = format_cursor(rows[-1].due_date, rows[-1].id)
+
+            # The windows shift when the next due date passes or the oldest
+            # recent assignment leaves the recent window.
+            next_due = db.session.query(func.min(Assignment.due_date)).filter(Assignment.due_date > now).scalar()
+            oldest_recent = db.session.query(func.min(Assignment.due_date)).filter(
+                Assignment.due_date >= recent_since, Assignment.due_date < now
+            ).scalar()
+            boundaries = [next_due]
+            if oldest_recent is not None:
+                boundaries.append(oldest_recent + recent_window)
+            valid_until = min((b for b in boundaries if b is not None), default=None)
+
+            table = render_template(
+                "fragments/student_assignments.html",
+                rows=rows,
+                view=view,
+                now=now,
+                is_first_page=cursor is None,
+                next_cursor=next_cursor,
+            )
+            return {"assignments_table": table}, valid_until
 
-        return render_template(
-            "student_dashboard.html",
-            assignments=assignments,
-            submissions_by_assignment=submissions_by_assignment,
-            now=datetime.utcnow(),
+        return cached_page(
+            "student_dashboard.html", f"student_dashboard:{view}:{after or ''}",
+            [GLOBAL_ASSIGNMENTS, student_scope(student_id)], build,
+            view=view, views=DASHBOARD_VIEWS,
         )
 
     @app.route("/assignments/<int:assignment_id>/submit", methods=["GET", "POST"])
@@ -274,20 +707,25 @@ def create_app():
             file = request.files.get("file")
 
             file_path = submission.file_path if submission else None
+            file_sha256 = submission.file_sha256 if submission else None
 
             if file and file.filename:
                 if allowed_file(file.filename):
-                    filename = secure_filename(f"{student_id}_{assignment_id}_{file.filename}")
-                    save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-                    file.save(save_path)
-                    file_path = filename
+                    file_path = secure_filename(f"{student_id}_{assignment_id}_{file.filename}")
+                    file_sha256 = store_upload(
+                        file, app.config["UPLOAD_FOLDER"], chunk_size=app.config["UPLOAD_CHUNK_SIZE"]
+                    )
+                    if submission:
+                        release_blob(submission.file_sha256)
                 else:
                     flash("File type not allowed.", "danger")
                     return render_template("submit_assignment.html", assignment=assignment, submission=submission)
 
             if submission:
+                text_changed = bool(text_response) and text_response != submission.text_response
                 submission.text_response = text_response or submission.text_response
                 submission.file_path = file_path
+                submission.file_sha256 = file_sha256
                 submission.submitted_at = datetime.utcnow()
                 submission.status = "submitted"
             else:
@@ -296,12 +734,22 @@ def create_app():
                     student_id=student_id,
                     text_response=text_response,
                     file_path=file_path,
+                    file_sha256=file_sha256,
                 )
                 db.session.add(submission)
-                db.session.flush()  # make sure submission.id exists
-
-            plagiarism_score = calculate_plagiarism_score(assignment_id, submission.id)
-            submission.plagiarism_score = plagiarism_score
+                try:
+                    db.session.flush()  # make sure submission.id exists
+                except IntegrityError:
+                    # A concurrent request already created this student's submission.
+                    db.session.rollback()
+                    flash("Your submission was already received. Please review it and resubmit.", "warning")
+                    return redirect(url_for("submit_assignment", assignment_id=assignment_id))
+                text_changed = True
+
+            if text_changed:
+                # Scored by the background worker once this transaction commits.
+                submission.plagiarism_score = None
+                enqueue_job("plagiarism", submission.id, group_key=f"assignment:{assignment_id}")
 
             db.session.commit()
             flash("Submission saved successfully.", "success")
@@ -309,65 +757,56 @@ def create_app():
 
         return render_template("submit_assignment.html", assignment=assignment, submission=submission)
 
-    def calculate_plagiarism_score(assignment_id, submission_id):
-        current = Submission.query.get(submission_id)
-        if not current or not current.text_response:
-            return 0.0
-
-        current_words = set(current.text_response.lower().split())
-        if not current_words:
-            return 0.0
-
-        other_submissions = Submission.query.filter(
-            Submission.assignment_id == assignment_id,
-            Submission.id != submission_id
-        ).all()
-
-        max_similarity = 0.0
-        for sub in other_submissions:
-            if not sub.text_response:
-                continue
-            other_words = set(sub.text_response.lower().split())
-            if not other_words:
-                continue
-            intersection = current_words.intersection(other_words)
-            union = current_words.union(other_words)
-            similarity = len(intersection) / len(union)
-            if similarity > max_similarity:
-                max_similarity = similarity
-
-        return round(max_similarity * 100, 2)
-
     @app.route("/student/submissions")
     @login_required(role="student")
     def student_submissions():
         student_id = session["user_id"]
-        submissions = Submission.query.filter_by(student_id=student_id).order_by(Submission.submitted_at.desc()).all()
-        return render_template("student_submissions.html", submissions=submissions)
+
+        def build():
+            submissions = Submission.query.options(
+                joinedload(Submission.assignment),
+                joinedload(Submission.feedback),
+            ).filter_by(student_id=student_id).order_by(Submission.submitted_at.desc()).all()
+            table = render_template("fragments/student_submissions.html", submissions=submissions)
+            return {"submissions_table": table}, None
+
+        return cached_page(
+            "student_submissions.html", "student_submissions",
+            [GLOBAL_ASSIGNMENTS, student_scope(student_id)], build,
+        )
 
     @app.route("/student/analytics")
     @login_required(role="student")
     def student_analytics():
         student_id = session["user_id"]
-        submissions = Submission.query.filter_by(student_id=student_id).all()
+
+        rollup = StudentGradeRollup.query.get(student_id)
+        if rollup and rollup.total_max:
+            overall_percent = round((rollup.total_score / rollup.total_max) * 100, 2)
+        else:
+            overall_percent = 0.0
+
+        rows = db.session.query(
+            Assignment.title, Feedback.score, Feedback.max_score
+        ).select_from(Submission).join(
+            Feedback, Feedback.submission_id == Submission.id
+        ).join(
+            Assignment, Assignment.id == Submission.assignment_id
+        ).filter(
+            Submission.student_id == student_id
+        ).order_by(
+            Submission.submitted_at.desc()
+        ).limit(app.config["ANALYTICS_CHART_LIMIT"]).all()
 
         data = []
-        total_score = 0.0
-        total_max = 0.0
-
-        for sub in submissions:
-            if sub.feedback:
-                pct = (sub.feedback.score / sub.feedback.max_score) * 100 if sub.feedback.max_score else 0
-                data.append({
-                    "assignment_title": sub.assignment.title,
-                    "score": sub.feedback.score,
-                    "max_score": sub.feedback.max_score,
-                    "percent": round(pct, 2),
-                })
-                total_score += sub.feedback.score
-                total_max += sub.feedback.max_score
-
-        overall_percent = round((total_score / total_max) * 100, 2) if total_max else 0.0
+        for title, score, max_score in reversed(rows):
+            pct = (score / max_score) * 100 if max_score else 0
+            data.append({
+                "assignment_title": title,
+                "score": score,
+                "max_score": max_score,
+                "percent": round(pct, 2),
+            })
 
         return render_template(
             "student_analytics.html",
@@ -375,17 +814,159 @@ def create_app():
             overall_percent=overall_percent,
         )
 
+    @app.template_global()
+    def upload_url(submission):
+        # Blob-backed files get their hash in the URL, so the URL changes
+        # whenever the content does and the response can be cached forever.
+        if submission.file_sha256:
+            return url_for("uploaded_file", filename=submission.file_path, v=submission.file_sha256)
+        return url_for("uploaded_file", filename=submission.file_path)
+
     @app.route("/uploads/<path:filename>")
     def uploaded_file(filename):
-        return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+        submission = Submission.query.filter(
+            Submission.file_path == filename, Submission.file_sha256.isnot(None)
+        ).first()
+        if not submission:
+            # Uploads saved before the blob store existed live directly in UPLOAD_FOLDER.
+            return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+
+        sha256 = submission.file_sha256
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        immutable = request.args.get("v") == sha256
+
+        def cache_headers(response):
+            response.set_etag(sha256)
+            response.cache_control.public = None
+            response.cache_control.private = True
+            if immutable:
+                response.cache_control.no_cache = None
+                response.cache_control.max_age = app.config["UPLOAD_CACHE_MAX_AGE"]
+                response.cache_control.immutable = True
+            else:
+                response.cache_control.no_cache = True
+            return response
+
+        if request.if_none_match.contains(sha256):
+            return cache_headers(app.response_class(status=304))
+
+        mode = app.config["UPLOAD_SERVE_MODE"]
+        if mode == "x-accel-redirect":
+            response = app.response_class(mimetype=mimetype)
+            response.headers["X-Accel-Redirect"] = app.config["UPLOAD_ACCEL_REDIRECT_PREFIX"].rstrip("/") + "/" + blob_key(sha256)
+        elif mode == "x-sendfile":
+            response = app.response_class(mimetype=mimetype)
+            response.headers["X-Sendfile"] = blob_path(app.config["UPLOAD_FOLDER"], sha256)
+        else:
+            # Werkzeug answers If-Range/Range by seeking, so only the requested
+            # bytes are read.
+            response = send_file(
+                blob_path(app.config["UPLOAD_FOLDER"], sha256),
+                mimetype=mimetype,
+                download_name=filename,
+                etag=sha256,
+                conditional=True,
+            )
+        if mode in {"x-accel-redirect", "x-sendfile"}:
+            # The proxy streams the file and handles Range itself.
+            response.headers["Content-Disposition"] = f"inline; filename={filename}"
+            response.accept_ranges = "bytes"
+        return cache_headers(response)
+
+    if app.config["METRICS_ENABLED"]:
+        @app.route("/metrics")
+        def metrics():
+            return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
 
     @app.errorhandler(413)
     def file_too_large(e):
         flash("File is too large. Maximum size is 16MB.", "danger")
         return redirect(request.referrer or url_for("index"))
 
+    @app.cli.command("rebuild-plagiarism-index")
+    def rebuild_plagiarism_index():
+        """Backfill MinHash signatures for submissions created before the index existed."""
+        count = rebuild_index()
+        print(f"Indexed {count} submissions.")
+
+    @app.cli.command("compute-similarity")
+    @click.argument("assignment_id", type=int)
+    def compute_similarity_command(assignment_id):
+        """Build the similarity report of an assignment now instead of through the worker."""
+        start = time.perf_counter()
+        report = compute_similarity(
+            assignment_id, app.config["SIMILARITY_TOP_K"], app.config["SIMILARITY_CLUSTER_PERCENT"]
+        )
+        db.session.commit()
+        print(f"Compared {report.submission_count} submissions, found {report.cluster_count} clusters "
+              f"in {time.perf_counter() - start:.1f}s.")
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index_command():
+        """Create the full-text search index and fill it from existing rows."""
+        count = rebuild_search_index()
+        db.session.commit()
+        print(f"Indexed {count} rows.")
+
+    @app.cli.command("import-roster")
+    @click.argument("csv_file", type=click.File("r", encoding="utf-8-sig"))
+    @click.option("--batch-size", type=int, default=None, help="Rows per transaction.")
+    @click.option("--workers", type=int, default=None, help="Password hashing processes.")
+    def import_roster_command(csv_file, batch_size, workers):
+        """Create accounts from a CSV with name,email,password[,role] columns."""
+        start = time.perf_counter()
+        created, errors = import_roster(
+            csv.DictReader(csv_file),
+            batch_size=batch_size or app.config["ROSTER_BATCH_SIZE"],
+            workers=workers or app.config["ROSTER_HASH_WORKERS"],
+            method=app.config["PASSWORD_HASH_METHOD"],
+        )
+        elapsed = time.perf_counter() - start
+        for error in errors:
+            print(f"Row {error['row']} ({error['email']}): {error['error']}")
+        rows = created + len(errors)
+        print(f"Created {created} accounts, {len(errors)} errors, {rows} rows in {elapsed:.1f}s "
+              f"({rows / elapsed if elapsed else 0:.1f} rows/s).")
+
+    @app.cli.command("rebuild-rollups")
+    def rebuild_rollups_command():
+        """Recompute grade rollups from existing feedback."""
+        rebuild_rollups()
+        db.session.commit()
+        print("Grade rollups rebuilt.")
+
+    @app.cli.command("gc-uploads")
+    def gc_uploads():
+        """Delete uploaded files no submission references any more, and expired roster uploads."""
+        removed, reclaimed = collect_garbage(
+            app.config["UPLOAD_FOLDER"], grace_seconds=app.config["UPLOAD_GC_GRACE_SECONDS"]
+        )
+        print(f"Removed {removed} files, reclaimed {reclaimed} bytes.")
+        expired = expire_roster_uploads(
+            app.config["ROSTER_UPLOAD_FOLDER"], app.config["ROSTER_UPLOAD_MAX_AGE_SECONDS"]
+        )
+        print(f"Removed {expired} expired roster uploads.")
+
+    @app.cli.command("export-grades")
+    @click.option("--assignment", "assignment_id", type=int, help="Export a single assignment.")
+    @click.option("--teacher", "teacher_id", type=int, help="Export every assignment of a teacher.")
+    @click.option("--format", "fmt", type=click.Choice(sorted(EXPORT_FORMATS)), default="csv")
+    @click.option("--output", type=click.File("w"), default="-", help="Output file (default: stdout).")
+    def export_grades(assignment_id, teacher_id, fmt, output):
+        """Stream the gradebook as CSV or JSONL."""
+        if assignment_id is None and teacher_id is None:
+            raise click.UsageError("Pass --assignment or --teacher.")
+        for chunk in stream_gradebook(fmt, assignment_id=assignment_id, teacher_id=teacher_id):
+            output.write(chunk)
+
+    @app.cli.command("upgrade-db")
+    def upgrade_db():
+        """Apply pending schema migrations."""
+        applied = upgrade_schema()
+        print(f"Applied migrations: {applied or 'none'}")
+
     with app.app_context():
-        db.create_all()
+        upgrade_schema()
 
     return app
 
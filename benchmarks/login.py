@@ -0,0 +1,139 @@
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode
+
+from benchmarks.routes import _percentiles
+
+
+# Login throughput under concurrency.
+#
+#     python -m benchmarks.login --users 500 --requests 400 --concurrency 32 --hash-workers 2
+#
+# Seeds a fresh database with --users student accounts, starts a threaded
+# Werkzeug server and fires --requests POST /login from --concurrency client
+# threads. While the burst runs, a probe thread keeps requesting the cheap
+# GET /login page to show how much the burst slows down everything else.
+# Passing --seed-method with a different cost than --method also measures
+# rehash-on-login (every account is upgraded on its first login).
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent logins.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=200, help="login attempts in the burst")
+    parser.add_argument("--concurrency", type=int, default=32, help="client threads")
+    parser.add_argument("--hash-workers", type=int, help="PASSWORD_HASH_WORKERS (default: config)")
+    parser.add_argument("--max-pending", type=int, help="PASSWORD_HASH_MAX_PENDING (default: config)")
+    parser.add_argument("--method", help="PASSWORD_HASH_METHOD (default: config)")
+    parser.add_argument("--seed-method", help="hash method of the seeded accounts (default: --method)")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="smartassign-login-")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+    for option, name in (
+        (args.hash_workers, "PASSWORD_HASH_WORKERS"),
+        (args.max_pending, "PASSWORD_HASH_MAX_PENDING"),
+        (args.method, "PASSWORD_HASH_METHOD"),
+    ):
+        if option is not None:
+            os.environ[name] = str(option)
+
+    from werkzeug.serving import make_server
+
+    from app import create_app
+    from benchmarks.seed import BENCHMARK_PASSWORD, seed_database
+
+    app = create_app()
+    method = app.config["PASSWORD_HASH_METHOD"]
+    with app.app_context():
+        seed_database(
+            teachers=1, students=args.users, assignments_per_teacher=1, submission_rate=0,
+            password_method=args.seed_method or method,
+        )
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def request(method_, path, body=None):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        headers = {"Content-Type": "application/x-www-form-urlencoded"} if body else {}
+        start = time.perf_counter()
+        try:
+            conn.request(method_, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return time.perf_counter() - start, response.status
+        finally:
+            conn.close()
+
+    def login(i):
+        body = urlencode({"email": f"student{i % args.users}@bench.example", "password": BENCHMARK_PASSWORD})
+        return request("POST", "/login", body)
+
+    probe_latencies = []
+    done = threading.Event()
+
+    def probe():
+        while not done.is_set():
+            probe_latencies.append(request("GET", "/login")[0])
+            done.wait(0.05)
+
+    try:
+        idle = [request("GET", "/login")[0] for _ in range(20)]
+        probe_thread = threading.Thread(target=probe)
+        probe_thread.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            outcomes = list(pool.map(login, range(args.requests)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        probe_thread.join()
+    finally:
+        server.shutdown()
+
+    statuses = {}
+    for _, status in outcomes:
+        statuses[status] = statuses.get(status, 0) + 1
+    accepted = [latency for latency, status in outcomes if status == 302]
+    report = {
+        "benchmark": "login",
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": vars(args),
+        "config": {
+            name: app.config[name]
+            for name in ("PASSWORD_HASH_METHOD", "PASSWORD_HASH_WORKERS", "PASSWORD_HASH_MAX_PENDING")
+        },
+        "status_codes": statuses,
+        "logins_per_second": round(len(accepted) / elapsed, 1),
+        "login_latency": _percentiles(accepted),
+        "rejected_latency": _percentiles([latency for latency, status in outcomes if status == 503]),
+        "other_route_idle": _percentiles(idle),
+        "other_route_during_burst": _percentiles(probe_latencies),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
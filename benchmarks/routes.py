@@ -0,0 +1,303 @@
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode
+
+from sqlalchemy import event
+
+
+# Route load test.
+#
+#     python -m benchmarks.routes --students 500 --iterations 50 --concurrency 8 --output bench.json
+#
+# Seeds a fresh database (see benchmarks/seed.py), then drives every route of
+# create_app() twice: sequentially through the Flask test client, recording
+# latency, SQL statements per request and peak Python memory per request, and
+# concurrently over real HTTP against a threaded Werkzeug server. Results are
+# written as JSON so runs can be compared release to release. Endpoints that
+# have no scenario below are listed under "uncovered".
+
+
+def _percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(pct):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": pick(50),
+        "p95_ms": pick(95),
+        "p99_ms": pick(99),
+    }
+
+
+class Scenario:
+    def __init__(self, endpoint, method, path, role=None, data=None, mutates=False):
+        self.endpoint = endpoint
+        self.method = method
+        self.path = path
+        self.role = role
+        self.data = data
+        self.mutates = mutates
+
+    @property
+    def name(self):
+        return f"{self.method} {self.endpoint}"
+
+
+def build_scenarios(ids):
+    assignment = ids["assignment_id"]
+    submission = ids["submission_id"]
+    grade = {
+        "score": "8", "max_score": "10", "rubric_clarity": "4",
+        "rubric_completion": "4", "rubric_presentation": "4", "comments": "benchmark",
+    }
+    return [
+        Scenario("index", "GET", "/"),
+        Scenario("login", "GET", "/login"),
+        Scenario("register", "GET", "/register"),
+        Scenario("teacher_dashboard", "GET", "/teacher/dashboard", role="teacher"),
+        Scenario("create_assignment", "GET", "/teacher/assignments/new", role="teacher"),
+        Scenario("view_assignment", "GET", f"/teacher/assignments/{assignment}", role="teacher"),
+        Scenario("review_submission", "GET", f"/teacher/submissions/{submission}", role="teacher"),
+        Scenario("review_submission", "POST", f"/teacher/submissions/{submission}", role="teacher",
+                 data=grade, mutates=True),
+        Scenario("bulk_grade", "GET", f"/teacher/assignments/{assignment}/grade", role="teacher"),
+        Scenario("export_assignment_grades", "GET", f"/teacher/assignments/{assignment}/export.csv", role="teacher"),
+        Scenario("export_teacher_grades", "GET", "/teacher/export.jsonl", role="teacher"),
+        Scenario("teacher_analytics", "GET", "/teacher/analytics", role="teacher"),
+        Scenario("assignment_analytics", "GET", f"/teacher/assignments/{assignment}/analytics", role="teacher"),
+        Scenario("teacher_search", "GET", "/teacher/search?q=analysis+evidence", role="teacher"),
+        Scenario("student_dashboard", "GET", "/student/dashboard", role="student"),
+        Scenario("submit_assignment", "GET", f"/assignments/{assignment}/submit", role="student"),
+        Scenario("submit_assignment", "POST", f"/assignments/{assignment}/submit", role="student",
+                 data={"text_response": ids["essay"]}, mutates=True),
+        Scenario("student_submissions", "GET", "/student/submissions", role="student"),
+        Scenario("student_analytics", "GET", "/student/analytics", role="student"),
+        Scenario("logout", "GET", "/logout"),
+    ]
+
+
+def pick_ids(seeded):
+    from models import db, Assignment, Submission
+
+    teacher_id = seeded["teacher_ids"][0]
+    assignment = Assignment.query.filter_by(teacher_id=teacher_id).order_by(Assignment.id).first()
+    submission = Submission.query.filter_by(assignment_id=assignment.id).order_by(Submission.id).first()
+    essay = db.session.query(Submission.text_response).filter(Submission.text_response.isnot(None)).first()
+    return {
+        "teacher_id": teacher_id,
+        "teacher_name": "Teacher 0",
+        "student_id": submission.student_id,
+        "student_name": "Student",
+        "assignment_id": assignment.id,
+        "submission_id": submission.id,
+        "essay": essay[0],
+    }
+
+
+def session_for(role, ids):
+    if role == "teacher":
+        return {"user_id": ids["teacher_id"], "user_name": ids["teacher_name"], "role": "teacher"}
+    if role == "student":
+        return {"user_id": ids["student_id"], "user_name": ids["student_name"], "role": "student"}
+    return {}
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+def run_test_client(app, scenarios, ids, iterations, warmup):
+    from models import db
+
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+
+    results = {}
+    for scenario in scenarios:
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess.update(session_for(scenario.role, ids))
+
+        def call():
+            if scenario.method == "GET":
+                response = client.get(scenario.path)
+            else:
+                response = client.post(scenario.path, data=scenario.data)
+            body = response.get_data()
+            response.close()
+            return response.status_code, len(body)
+
+        for _ in range(warmup):
+            call()
+            if scenario.endpoint == "logout":
+                with client.session_transaction() as sess:
+                    sess.update(session_for(scenario.role, ids))
+
+        latencies = []
+        queries = []
+        statuses = {}
+        for _ in range(iterations):
+            if scenario.endpoint == "logout":
+                with client.session_transaction() as sess:
+                    sess.update(session_for(scenario.role, ids))
+            before = counter.count
+            start = time.perf_counter()
+            status, _size = call()
+            latencies.append(time.perf_counter() - start)
+            queries.append(counter.count - before)
+            statuses[status] = statuses.get(status, 0) + 1
+
+        # Memory is measured separately: tracemalloc slows every allocation.
+        tracemalloc.start()
+        peaks = []
+        for _ in range(min(iterations, 5)):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            call()
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        tracemalloc.stop()
+
+        results[scenario.name] = {
+            "path": scenario.path,
+            "status_codes": statuses,
+            "latency": _percentiles(latencies),
+            "queries_per_request": {
+                "mean": round(statistics.fmean(queries), 2),
+                "max": max(queries),
+            },
+            "peak_memory_kib": round(max(peaks) / 1024, 1),
+        }
+    return results
+
+
+def run_http(app, scenarios, ids, requests_per_route, concurrency):
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    port = server.server_port
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    serializer = app.session_interface.get_signing_serializer(app)
+    cookie_name = app.config["SESSION_COOKIE_NAME"]
+
+    results = {}
+    try:
+        for scenario in scenarios:
+            session_data = session_for(scenario.role, ids)
+            cookie = f"{cookie_name}={serializer.dumps(session_data)}" if session_data else ""
+            body = None
+            headers = {"Cookie": cookie} if cookie else {}
+            if scenario.data:
+                body = urlencode(scenario.data)
+                headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+            def one_request(_):
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                start = time.perf_counter()
+                try:
+                    conn.request(scenario.method, scenario.path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    return time.perf_counter() - start, response.status
+                finally:
+                    conn.close()
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                outcomes = list(pool.map(one_request, range(requests_per_route)))
+            elapsed = time.perf_counter() - start
+
+            statuses = {}
+            for _, status in outcomes:
+                statuses[status] = statuses.get(status, 0) + 1
+            results[scenario.name] = {
+                "path": scenario.path,
+                "status_codes": statuses,
+                "latency": _percentiles([latency for latency, _ in outcomes]),
+                "requests_per_second": round(len(outcomes) / elapsed, 1),
+            }
+    finally:
+        server.shutdown()
+    return results
+
+
+def main():
+    from benchmarks.seed import add_arguments, seed_database, seed_options
+
+    parser = argparse.ArgumentParser(description="Benchmark every route of the app.")
+    add_arguments(parser)
+    parser.add_argument("--iterations", type=int, default=30, help="test-client requests per route")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--http-requests", type=int, default=100, help="HTTP requests per route (0 to skip)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--include-writes", action="store_true", help="also benchmark POST routes")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="smartassign-bench-")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+    from app import create_app
+
+    app = create_app()
+    app.config["UPLOAD_FOLDER"] = os.path.join(workdir, "uploads")
+
+    with app.app_context():
+        start = time.perf_counter()
+        seeded = seed_database(**seed_options(args))
+        seed_seconds = time.perf_counter() - start
+        ids = pick_ids(seeded)
+
+    scenarios = build_scenarios(ids)
+    if not args.include_writes:
+        scenarios = [s for s in scenarios if not s.mutates]
+    covered = {s.endpoint for s in scenarios} | {"static"}
+    uncovered = sorted({rule.endpoint for rule in app.url_map.iter_rules()} - covered)
+
+    report = {
+        "benchmark": "routes",
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": vars(args),
+        "dataset": {k: v for k, v in seeded.items() if not k.endswith("_ids")},
+        "seed_seconds": round(seed_seconds, 2),
+        "test_client": run_test_client(app, scenarios, ids, args.iterations, args.warmup),
+        "uncovered": uncovered,
+    }
+    if args.http_requests:
+        report["http"] = run_http(app, scenarios, ids, args.http_requests, args.concurrency)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
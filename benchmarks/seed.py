@@ -0,0 +1,234 @@
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from models import db, User, Assignment, Submission, Feedback
+from passwords import DEFAULT_METHOD, hash_password
+from plagiarism import rebuild_index
+from rollups import rebuild_rollups
+
+
+# Synthetic data generator for benchmarks.
+#
+#     python -m benchmarks.seed --database sqlite:////tmp/bench.db --students 2000
+#
+# Every generated account uses BENCHMARK_PASSWORD so load tests can log in.
+
+BENCHMARK_PASSWORD = "benchmark-password"
+
+_VOCABULARY = [
+    "analysis", "data", "result", "method", "system", "model", "theory", "design",
+    "process", "function", "value", "structure", "approach", "research", "evidence",
+    "argument", "example", "problem", "solution", "experiment", "variable", "sample",
+    "report", "figure", "table", "source", "claim", "context", "impact", "factor",
+    "the", "of", "and", "to", "in", "is", "that", "for", "it", "as", "with", "was",
+    "on", "be", "by", "this", "are", "from", "which", "an", "or", "not", "can",
+] + [f"term{i}" for i in range(5000)]
+
+
+def _zipf_weights(n):
+    return [1.0 / (rank + 1) for rank in range(n)]
+
+
+class TextGenerator:
+    def __init__(self, rng):
+        self.rng = rng
+        self.weights = _zipf_weights(len(_VOCABULARY))
+
+    def essay(self, min_words, max_words):
+        length = self.rng.randint(min_words, max_words)
+        return " ".join(self.rng.choices(_VOCABULARY, weights=self.weights, k=length))
+
+    def copy_of(self, text, keep=0.8):
+        words = text.split()
+        return " ".join(w if self.rng.random() < keep else self.rng.choice(_VOCABULARY) for w in words)
+
+
+def seed_database(
+    teachers=5,
+    students=200,
+    assignments_per_teacher=10,
+    submission_rate=0.9,
+    graded_rate=0.6,
+    copy_rate=0.05,
+    min_words=150,
+    max_words=1200,
+    seed=42,
+    batch_size=1000,
+    index_plagiarism=False,
+    password_method=DEFAULT_METHOD,
+):
+    """Fill the current app's database with synthetic users, work and grades.
+
+    Must run inside an app context on an empty database. Returns a dict of
+    row counts and the ids benchmarks need to build URLs. index_plagiarism
+    builds the MinHash index (and recomputes scores), which is slow for large
+    data sets; without it the seeded plagiarism scores are random.
+    """
+    rng = random.Random(seed)
+    texts = TextGenerator(rng)
+    now = datetime.utcnow()
+    password_hash = hash_password(BENCHMARK_PASSWORD, password_method)
+
+    db.session.execute(insert(User), [
+        {
+            "name": f"Teacher {i}",
+            "email": f"teacher{i}@bench.example",
+            "password_hash": password_hash,
+            "role": "teacher",
+            "created_at": now,
+        }
+        for i in range(teachers)
+    ] + [
+        {
+            "name": f"Student {i}",
+            "email": f"student{i}@bench.example",
+            "password_hash": password_hash,
+            "role": "student",
+            "created_at": now,
+        }
+        for i in range(students)
+    ])
+    teacher_ids = [row.id for row in db.session.query(User.id).filter_by(role="teacher").order_by(User.id)]
+    student_ids = [row.id for row in db.session.query(User.id).filter_by(role="student").order_by(User.id)]
+
+    assignment_rows = []
+    for teacher_id in teacher_ids:
+        for i in range(assignments_per_teacher):
+            due = now + timedelta(days=rng.randint(-60, 60))
+            assignment_rows.append({
+                "title": f"Assignment {i} of teacher {teacher_id}",
+                "description": texts.essay(30, 120),
+                "due_date": due,
+                "created_at": due - timedelta(days=14),
+                "teacher_id": teacher_id,
+            })
+    db.session.execute(insert(Assignment), assignment_rows)
+    assignments = db.session.query(Assignment.id, Assignment.teacher_id, Assignment.created_at).all()
+
+    submission_count = 0
+    pending = []
+
+    def flush_submissions():
+        nonlocal pending
+        if pending:
+            db.session.execute(insert(Submission), pending)
+            pending = []
+
+    for assignment in assignments:
+        originals = []
+        for student_id in student_ids:
+            if rng.random() > submission_rate:
+                continue
+            if originals and rng.random() < copy_rate:
+                text = texts.copy_of(rng.choice(originals))
+            else:
+                text = texts.essay(min_words, max_words)
+                if len(originals) < 20:
+                    originals.append(text)
+            pending.append({
+                "assignment_id": assignment.id,
+                "student_id": student_id,
+                "text_response": text,
+                "submitted_at": assignment.created_at + timedelta(minutes=rng.randint(0, 20000)),
+                "status": "submitted",
+                "plagiarism_score": round(rng.uniform(0, 60), 2),
+            })
+            submission_count += 1
+            if len(pending) >= batch_size:
+                flush_submissions()
+    flush_submissions()
+
+    teacher_of = {a.id: a.teacher_id for a in assignments}
+    graded = []
+    feedback_rows = []
+    for sub in db.session.query(Submission.id, Submission.assignment_id).yield_per(batch_size):
+        if rng.random() < graded_rate:
+            max_score = rng.choice([10.0, 20.0, 100.0])
+            feedback_rows.append({
+                "submission_id": sub.id,
+                "teacher_id": teacher_of[sub.assignment_id],
+                "score": round(rng.triangular(0, max_score, max_score * 0.75), 1),
+                "max_score": max_score,
+                "rubric_clarity": rng.randint(1, 5),
+                "rubric_completion": rng.randint(1, 5),
+                "rubric_presentation": rng.randint(1, 5),
+                "comments": texts.essay(5, 40),
+                "created_at": now,
+            })
+            graded.append(sub.id)
+
+    for start in range(0, len(feedback_rows), batch_size):
+        db.session.execute(insert(Feedback), feedback_rows[start:start + batch_size])
+    for start in range(0, len(graded), batch_size):
+        db.session.query(Submission).filter(Submission.id.in_(graded[start:start + batch_size])).update(
+            {Submission.status: "graded"}, synchronize_session=False
+        )
+    db.session.commit()
+
+    rebuild_rollups()
+    db.session.commit()
+    if index_plagiarism:
+        rebuild_index()
+
+    return {
+        "teachers": len(teacher_ids),
+        "students": len(student_ids),
+        "assignments": len(assignments),
+        "submissions": submission_count,
+        "feedback": len(feedback_rows),
+        "teacher_ids": teacher_ids,
+        "student_ids": student_ids,
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument("--teachers", type=int, default=5)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--assignments-per-teacher", type=int, default=10)
+    parser.add_argument("--submission-rate", type=float, default=0.9)
+    parser.add_argument("--graded-rate", type=float, default=0.6)
+    parser.add_argument("--min-words", type=int, default=150)
+    parser.add_argument("--max-words", type=int, default=1200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--index-plagiarism", action="store_true", help="build the MinHash index")
+
+
+def seed_options(args):
+    return {
+        "teachers": args.teachers,
+        "students": args.students,
+        "assignments_per_teacher": args.assignments_per_teacher,
+        "submission_rate": args.submission_rate,
+        "graded_rate": args.graded_rate,
+        "min_words": args.min_words,
+        "max_words": args.max_words,
+        "seed": args.seed,
+        "index_plagiarism": args.index_plagiarism,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a database with synthetic benchmark data.")
+    parser.add_argument("--database", required=True, help="SQLAlchemy URL of an empty database")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        start = time.perf_counter()
+        counts = seed_database(**seed_options(args))
+    counts.pop("teacher_ids")
+    counts.pop("student_ids")
+    print(f"Seeded {counts} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from config import Config
+from database import install_sqlite_pragmas
+from models import db
+
+
+# Concurrent read/write throughput of the SQLite engine profile.
+#
+#     python -m benchmarks.sqlite_profile --writers 4 --readers 8 --seconds 10
+#
+# Runs the same mixed workload (submission updates + feedback inserts against
+# teacher-dashboard style aggregate reads) on a fresh database file, once with
+# driver defaults and once with the Config profile, and prints JSON results.
+
+READ_SQL = text(
+    "SELECT a.id, COUNT(s.id), SUM(CASE WHEN s.status = 'graded' THEN 1 ELSE 0 END) "
+    "FROM assignments a LEFT JOIN submissions s ON s.assignment_id = a.id "
+    "WHERE a.teacher_id = :teacher GROUP BY a.id"
+)
+WRITE_SQL = text(
+    "UPDATE submissions SET text_response = :text, submitted_at = :now, status = 'submitted' "
+    "WHERE id = :id"
+)
+
+
+def _config_dict():
+    return {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+
+
+def _seed(engine, assignments, submissions_per_assignment):
+    db.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (id, name, email, password_hash, role, created_at) "
+            "VALUES (1, 'Teacher', 'teacher@example.com', 'x', 'teacher', :now)"
+        ), {"now": now})
+        conn.execute(text(
+            "INSERT INTO users (name, email, password_hash, role, created_at) "
+            "VALUES (:name, :email, 'x', 'student', :now)"
+        ), [
+            {"name": f"Student {i}", "email": f"student{i}@example.com", "now": now}
+            for i in range(submissions_per_assignment)
+        ])
+        conn.execute(text(
+            "INSERT INTO assignments (title, description, due_date, created_at, teacher_id) "
+            "VALUES (:title, 'benchmark', :now, :now, 1)"
+        ), [{"title": f"Assignment {i}", "now": now} for i in range(assignments)])
+        conn.execute(text(
+            "INSERT INTO submissions (assignment_id, student_id, text_response, submitted_at, status) "
+            "VALUES (:assignment, :student, 'seed', :now, 'submitted')"
+        ), [
+            {"assignment": a + 1, "student": s + 2, "now": now}
+            for a in range(assignments)
+            for s in range(submissions_per_assignment)
+        ])
+    return assignments * submissions_per_assignment
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_profile(name, engine, writers, readers, seconds, submission_count):
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"reads": [], "writes": [], "read_errors": 0, "write_errors": 0}
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(READ_SQL, {"teacher": 1}).fetchall()
+            except OperationalError:
+                with lock:
+                    stats["read_errors"] += 1
+                continue
+            with lock:
+                stats["reads"].append(time.perf_counter() - start)
+
+    def writer():
+        rng = random.Random()
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(WRITE_SQL, {
+                        "id": rng.randint(1, submission_count),
+                        "text": "lorem ipsum " * rng.randint(50, 300),
+                        "now": datetime.utcnow(),
+                    })
+            except OperationalError:
+                with lock:
+                    stats["write_errors"] += 1
+                continue
+            with lock:
+                stats["writes"].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    result = {"profile": name}
+    for kind in ("reads", "writes"):
+        latencies = stats[kind]
+        result[kind] = {
+            "ops": len(latencies),
+            "ops_per_second": round(len(latencies) / seconds, 1),
+            "errors": stats[f"{kind[:-1]}_errors"],
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 2) if latencies else None,
+            "p95_ms": round(_percentile(latencies, 95) * 1000, 2) if latencies else None,
+            "p99_ms": round(_percentile(latencies, 99) * 1000, 2) if latencies else None,
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite engine profile.")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--assignments", type=int, default=50)
+    parser.add_argument("--submissions", type=int, default=200, help="submissions per assignment")
+    args = parser.parse_args()
+
+    config = _config_dict()
+    results = []
+    for name in ("driver-defaults", "production"):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = "sqlite:///" + os.path.join(tmp, "bench.db")
+            if name == "production":
+                engine = create_engine(url, **config["SQLALCHEMY_ENGINE_OPTIONS"])
+                install_sqlite_pragmas(engine, config)
+            else:
+                engine = create_engine(url)
+            count = _seed(engine, args.assignments, args.submissions)
+            results.append(run_profile(name, engine, args.writers, args.readers, args.seconds, count))
+            engine.dispose()
+
+    print(json.dumps({"benchmark": "sqlite_profile", "params": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+
+# Rendered-fragment cache for the dashboards.
+#
+# Entries are keyed by page, user and the data versions (see versions.py) of
+# everything the page shows, so a write never has to find and delete entries:
+# it bumps a version and later reads simply miss. Stale keys age out of the
+# LRU, or expire after CACHE_TTL_SECONDS in a shared backend.
+#
+# A backend is any object with get(key) -> str | None and set(key, value).
+# CACHE_BACKEND selects "lru" (per process, the default), "redis" (shared
+# between processes; needs the redis package and CACHE_REDIS_URL) or "null".
+
+
+class LRUCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisCache:
+    def __init__(self, url, ttl_seconds):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package (pip install redis).")
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key):
+        value = self.client.get(key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(key, value.encode("utf-8"), ex=self.ttl_seconds)
+
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+
+def create_backend(config):
+    backend = config["CACHE_BACKEND"].lower()
+    if backend == "lru":
+        return LRUCache(config["CACHE_MAX_ENTRIES"])
+    if backend == "redis":
+        return RedisCache(config["CACHE_REDIS_URL"], config["CACHE_TTL_SECONDS"])
+    if backend in ("null", "none"):
+        return NullCache()
+    raise ValueError(f"Unsupported CACHE_BACKEND: {backend}")
+
+
+def templates_fingerprint(template_folder):
+    """Hash every template so a deploy with changed markup gets new cache keys."""
+    digest = hashlib.sha256()
+    for root, dirs, files in sorted(os.walk(template_folder)):
+        dirs.sort()
+        for name in sorted(files):
+            with open(os.path.join(root, name), "rb") as f:
+                digest.update(name.encode("utf-8"))
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class FragmentCache:
+    def __init__(self, backend, prefix):
+        self.backend = backend
+        self.prefix = prefix
+
+    def key(self, page, user_id, versions):
+        parts = ",".join(f"{scope}={versions[scope]}" for scope in sorted(versions))
+        return f"{self.prefix}:{page}:{user_id}:{parts}"
+
+    def get_or_build(self, key, build):
+        """Return the cached entry for key, calling build() on a miss.
+
+        build() returns (fragments, valid_until): a dict of rendered HTML strings
+        and the naive UTC datetime at which they go stale on their own (for
+        example when a due date passes), or None.
+        """
+        raw = self.backend.get(key)
+        if raw is not None:
+            entry = json.loads(raw)
+            valid_until = entry["valid_until"]
+            if valid_until is None or datetime.fromisoformat(valid_until) > datetime.utcnow():
+                return entry
+
+        fragments, valid_until = build()
+        entry = {
+            "fragments": fragments,
+            "valid_until": valid_until.isoformat() if valid_until else None,
+        }
+        self.backend.set(key, json.dumps(entry))
+        return entry
+
+    @staticmethod
+    def etag(key, entry, *extra):
+        digest = hashlib.sha1(key.encode("utf-8"))
+        digest.update(str(entry["valid_until"]).encode("utf-8"))
+        for value in extra:
+            digest.update(b"\0" + str(value).encode("utf-8"))
+        return digest.hexdigest()
@@ -1,7 +1,33 @@
 import os
 
+from sqlalchemy.engine import make_url
+
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
+
+def engine_options(database_uri):
+    """Connection pool settings for database_uri.
+
+    In-memory SQLite gets a single shared connection from SQLAlchemy and takes
+    no pool arguments; for SQLite files pre-ping is pointless (there is no
+    server connection to go stale).
+    """
+    url = make_url(database_uri)
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:") or url.query.get("mode") == "memory":
+            return {}
+        pre_ping = False
+    else:
+        pre_ping = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
+    return {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", "3600")),
+        "pool_pre_ping": pre_ping,
+    }
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key")
     SQLALCHEMY_DATABASE_URI = os.environ.get(
@@ -9,5 +35,72 @@ class Config:
         "sqlite:///" + os.path.join(BASE_DIR, "smart_assignments.db")
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Applied to every SQLite connection (see database.py). WAL lets readers
+    # run alongside the single writer; busy_timeout makes writers queue for the
+    # lock instead of failing with "database is locked".
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
     UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB
+
+    # Background jobs (see worker.py)
+    WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "2"))
+    JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "300"))
+    JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+    JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1.0"))
+
+    SUBMISSIONS_PAGE_SIZE = int(os.environ.get("SUBMISSIONS_PAGE_SIZE", "50"))
+    DASHBOARD_PAGE_SIZE = int(os.environ.get("DASHBOARD_PAGE_SIZE", "20"))
+    DASHBOARD_RECENT_DAYS = int(os.environ.get("DASHBOARD_RECENT_DAYS", "14"))
+    SEARCH_RESULTS_LIMIT = int(os.environ.get("SEARCH_RESULTS_LIMIT", "50"))
+    ANALYTICS_CHART_LIMIT = int(os.environ.get("ANALYTICS_CHART_LIMIT", "50"))
+    ANALYTICS_AT_RISK_PERCENT = float(os.environ.get("ANALYTICS_AT_RISK_PERCENT", "50"))
+    ANALYTICS_AT_RISK_LIMIT = int(os.environ.get("ANALYTICS_AT_RISK_LIMIT", "25"))
+
+    # Content-addressed upload store (see storage.py)
+    UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+    UPLOAD_GC_GRACE_SECONDS = int(os.environ.get("UPLOAD_GC_GRACE_SECONDS", "3600"))
+    # "direct" streams blobs from Python; "x-sendfile" (Apache/lighttpd) and
+    # "x-accel-redirect" (nginx) hand the transfer to the reverse proxy.
+    UPLOAD_SERVE_MODE = os.environ.get("UPLOAD_SERVE_MODE", "direct")
+    UPLOAD_ACCEL_REDIRECT_PREFIX = os.environ.get("UPLOAD_ACCEL_REDIRECT_PREFIX", "/protected-uploads/")
+    UPLOAD_CACHE_MAX_AGE = int(os.environ.get("UPLOAD_CACHE_MAX_AGE", str(365 * 24 * 3600)))
+
+    # Assignment-wide similarity reports (see similarity.py)
+    SIMILARITY_TOP_K = int(os.environ.get("SIMILARITY_TOP_K", "5"))
+    SIMILARITY_CLUSTER_PERCENT = float(os.environ.get("SIMILARITY_CLUSTER_PERCENT", "60"))
+
+    # Password hashing (see passwords.py). Changing the method or its cost
+    # upgrades stored hashes as users log in. PASSWORD_HASH_WORKERS and
+    # PASSWORD_HASH_MAX_PENDING apply per server process, so with several
+    # processes per host keep workers x processes below the CPU count.
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // 4))))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "32"))
+    LOGIN_RETRY_AFTER_SECONDS = int(os.environ.get("LOGIN_RETRY_AFTER_SECONDS", "2"))
+
+    # Bulk account import (see roster.py). ROSTER_HASH_WORKERS processes are
+    # started per running import. Uploaded rosters contain plaintext passwords:
+    # they are kept in ROSTER_UPLOAD_FOLDER only until their import ends, and
+    # "flask gc-uploads" deletes any older than ROSTER_UPLOAD_MAX_AGE_SECONDS.
+    ROSTER_BATCH_SIZE = int(os.environ.get("ROSTER_BATCH_SIZE", "500"))
+    ROSTER_HASH_WORKERS = int(os.environ.get("ROSTER_HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // 4))))
+    ROSTER_UPLOAD_FOLDER = os.environ.get("ROSTER_UPLOAD_FOLDER", os.path.join(BASE_DIR, "roster_uploads"))
+    ROSTER_UPLOAD_MAX_AGE_SECONDS = int(os.environ.get("ROSTER_UPLOAD_MAX_AGE_SECONDS", str(24 * 3600)))
+
+    # Dashboard fragment cache (see cache.py)
+    CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "lru")
+    CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "4096"))
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_TTL_SECONDS = int(os.environ.get("CACHE_TTL_SECONDS", "3600"))
+    CACHE_KEY_PREFIX = os.environ.get("CACHE_KEY_PREFIX", "smartassign")
+
+    # Request instrumentation and the /metrics endpoint (see metrics.py)
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+    SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "500"))
+    SLOW_REQUEST_STATEMENTS = int(os.environ.get("SLOW_REQUEST_STATEMENTS", "25"))
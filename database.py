@@ -0,0 +1,81 @@
+from sqlalchemy import event, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+
+# SQLite connection profile. The pragmas are per connection (except
+# journal_mode, which sticks to the database file), so they are applied from a
+# "connect" listener to every connection the pool opens.
+
+JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def sqlite_pragmas(config):
+    journal_mode = config["SQLITE_JOURNAL_MODE"].upper()
+    synchronous = config["SQLITE_SYNCHRONOUS"].upper()
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError(f"Unsupported SQLITE_JOURNAL_MODE: {journal_mode}")
+    if synchronous not in SYNCHRONOUS_MODES:
+        raise ValueError(f"Unsupported SQLITE_SYNCHRONOUS: {synchronous}")
+
+    return [
+        f"PRAGMA journal_mode={journal_mode}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous={synchronous}",
+        f"PRAGMA cache_size={int(config['SQLITE_CACHE_SIZE'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def install_sqlite_pragmas(engine, config):
+    """Apply the configured pragmas to every new connection of a SQLite engine."""
+    if engine.dialect.name != "sqlite":
+        return
+    statements = sqlite_pragmas(config)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+
+
+# Counter upserts (rollups.py, versions.py). SQLite and PostgreSQL get one
+# INSERT .. ON CONFLICT DO UPDATE; other databases an UPDATE and, when no row
+# matched, an INSERT in a savepoint that falls back to the UPDATE if another
+# transaction created the row first.
+
+_ON_CONFLICT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def upsert(session, model, key_column, rows, add=(), replace=()):
+    """Insert rows (dicts), or for keys that exist add the `add` columns of the
+    row to the stored values and overwrite the `replace` columns.
+
+    Uses Core statements only, so it is safe to call from a before_flush listener.
+    """
+    if not rows:
+        return
+    on_conflict_insert = _ON_CONFLICT_INSERTS.get(session.get_bind().dialect.name)
+    if on_conflict_insert is not None:
+        stmt = on_conflict_insert(model).values(rows)
+        set_ = {name: getattr(model, name) + stmt.excluded[name] for name in add}
+        set_.update((name, stmt.excluded[name]) for name in replace)
+        session.execute(stmt.on_conflict_do_update(index_elements=[key_column], set_=set_))
+        return
+
+    connection = session.connection()
+    for row in rows:
+        values = {name: getattr(model, name) + row[name] for name in add}
+        values.update((name, row[name]) for name in replace)
+        increment = update(model).where(key_column == row[key_column.key]).values(values)
+        if connection.execute(increment).rowcount:
+            continue
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(model).values(row))
+        except IntegrityError:
+            connection.execute(increment)
@@ -0,0 +1,127 @@
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from models import db, User, Assignment, Submission, Feedback
+
+
+# Streaming gradebook export. Rows come straight off a server-side cursor and
+# are serialized in small chunks, so memory use does not depend on how many
+# rows are exported and the first bytes go out before the query has finished.
+
+EXPORT_COLUMNS = (
+    "assignment_id",
+    "assignment_title",
+    "submission_id",
+    "student_id",
+    "student_name",
+    "student_email",
+    "submitted_at",
+    "status",
+    "plagiarism_score",
+    "score",
+    "max_score",
+    "rubric_clarity",
+    "rubric_completion",
+    "rubric_presentation",
+    "comments",
+)
+
+# Cells starting with these run as formulas in Excel and Sheets.
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+def gradebook_query(assignment_id=None, teacher_id=None):
+    stmt = select(
+        Assignment.id.label("assignment_id"),
+        Assignment.title.label("assignment_title"),
+        Submission.id.label("submission_id"),
+        User.id.label("student_id"),
+        User.name.label("student_name"),
+        User.email.label("student_email"),
+        Submission.submitted_at,
+        Submission.status,
+        Submission.plagiarism_score,
+        Feedback.score,
+        Feedback.max_score,
+        Feedback.rubric_clarity,
+        Feedback.rubric_completion,
+        Feedback.rubric_presentation,
+        Feedback.comments,
+    ).select_from(Submission).join(
+        Assignment, Assignment.id == Submission.assignment_id
+    ).join(
+        User, User.id == Submission.student_id
+    ).outerjoin(
+        Feedback, Feedback.submission_id == Submission.id
+    ).order_by(Submission.assignment_id, Submission.id)
+
+    if assignment_id is not None:
+        stmt = stmt.where(Submission.assignment_id == assignment_id)
+    if teacher_id is not None:
+        stmt = stmt.where(Assignment.teacher_id == teacher_id)
+    return stmt
+
+
+def iter_gradebook(stmt, batch_size=1000):
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        for row in result:
+            values = row._asdict()
+            if values["submitted_at"] is not None:
+                values["submitted_at"] = values["submitted_at"].isoformat()
+            yield values
+    finally:
+        result.close()
+
+
+def _chunked(lines, rows_per_chunk):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= rows_per_chunk:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def _csv_cell(value):
+    """Neutralise text a spreadsheet would evaluate (student names, comments)."""
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_lines(rows):
+    out = io.StringIO()
+    writer = csv.writer(out)
+
+    def line(values):
+        out.seek(0)
+        out.truncate()
+        writer.writerow(values)
+        return out.getvalue()
+
+    yield line(EXPORT_COLUMNS)
+    for row in rows:
+        yield line(_csv_cell(row[column]) for column in EXPORT_COLUMNS)
+
+
+def _jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+def stream_gradebook(fmt, assignment_id=None, teacher_id=None, rows_per_chunk=200):
+    """Yield the serialized gradebook in chunks of rows_per_chunk rows."""
+    rows = iter_gradebook(gradebook_query(assignment_id=assignment_id, teacher_id=teacher_id))
+    lines = _csv_lines(rows) if fmt == "csv" else _jsonl_lines(rows)
+    return _chunked(lines, rows_per_chunk)
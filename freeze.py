@@ -1,54 +1,295 @@
-import shutil
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-from app import create_app
 
+# Static exporter (does NOT reproduce login/backend behavior).
+#
+#     python freeze.py [--workers 8] [--force]
+#
+# Fetches a small set of public pages through Flask's test client and writes
+# them to build/ next to a copy of static/. The export is incremental: every
+# page and asset is hashed and only files whose content changed are rewritten,
+# outputs that are no longer produced are deleted, and build/manifest.json
+# records what was written. Assets get a content hash in their file name
+# (css/styles.css -> static/css/styles.<hash>.css) and every reference in the
+# pages and stylesheets is rewritten to match, so the host can cache /static/
+# forever (see the generated _headers file for Netlify).
 
-# Simple static exporter (does NOT reproduce login/backend behavior).
-# It uses Flask's test client to fetch a small set of public pages
-# and copies the `static/` folder into `build/static` so assets are available.
+STATIC_DIR = Path("static")
+MANIFEST_NAME = "manifest.json"
+HEADERS_NAME = "_headers"
+HASH_LENGTH = 12
+# Below this many pages, starting worker processes costs more than it saves.
+PARALLEL_THRESHOLD = 32
 
-APP = create_app()
-BUILD_DIR = Path("build")
+# Pages to export. Add more public routes if you have them.
+PATHS = ["/", "/login", "/register"]
 
+_STATIC_REF = re.compile(r"""(?P<prefix>["'(=]\s*)/static/(?P<path>[^"')\s?#]+)""")
+_CSS_URL = re.compile(r"""url\(\s*(?P<quote>["']?)(?P<path>[^"')]+)(?P=quote)\s*\)""")
 
-def clean_build():
-    if BUILD_DIR.exists():
-        shutil.rmtree(BUILD_DIR)
-    BUILD_DIR.mkdir(parents=True, exist_ok=True)
+_app = None
 
 
-def copy_static():
-    src = Path("static")
-    dst = BUILD_DIR / "static"
-    if src.exists():
-        shutil.copytree(src, dst)
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
 
 
-def export_paths(paths):
-    with APP.test_client() as client:
-        for p in paths:
-            resp = client.get(p, follow_redirects=True)
-            if resp.status_code == 200:
-                html = resp.get_data(as_text=True)
-                if p == "/":
-                    out = BUILD_DIR / "index.html"
-                else:
-                    name = p.strip("/").replace("/", "_") or "index"
-                    out = BUILD_DIR / f"{name}.html"
-                out.write_text(html, encoding="utf-8")
-                print(f"Wrote {out}")
-            else:
-                print(f"Skipping {p} (status {resp.status_code})")
+def output_name(path):
+    if path == "/":
+        return "index.html"
+    name = path.strip("/").replace("/", "_") or "index"
+    return f"{name}.html"
+
+
+def fingerprinted(relative, digest):
+    stem, dot, suffix = relative.rpartition(".")
+    if not dot or "/" in suffix:
+        return f"{relative}.{digest[:HASH_LENGTH]}"
+    return f"{stem}.{digest[:HASH_LENGTH]}.{suffix}"
+
+
+def load_manifest(build_dir):
+    try:
+        with open(build_dir / MANIFEST_NAME, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def source_digest(source, relative, previous):
+    """Hash a static file, reusing the manifest hash while its size and mtime are unchanged."""
+    stat = source.stat()
+    cached = previous.get(relative)
+    if cached and cached.get("size") == stat.st_size and cached.get("mtime_ns") == stat.st_mtime_ns:
+        return cached["source_sha256"], stat
+    return sha256(source.read_bytes()), stat
+
+
+def collect_assets(previous):
+    """Map every file under static/ to its fingerprinted output name and content.
+
+    Stylesheets are fingerprinted after the files they reference, because
+    rewriting their url(...) references changes their own hash.
+    """
+    sources = sorted(p for p in STATIC_DIR.rglob("*") if p.is_file()) if STATIC_DIR.exists() else []
+    assets = {}
+    urls = {}
+
+    for source in sources:
+        relative = source.relative_to(STATIC_DIR).as_posix()
+        if source.suffix == ".css":
+            continue
+        digest, stat = source_digest(source, relative, previous)
+        name = fingerprinted(relative, digest)
+        assets[relative] = {
+            "file": f"static/{name}",
+            "sha256": digest,
+            "source_sha256": digest,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "source": source,
+        }
+        urls[relative] = name
+
+    for source in sources:
+        if source.suffix != ".css":
+            continue
+        relative = source.relative_to(STATIC_DIR).as_posix()
+        stat = source.stat()
+        css = rewrite_css(source.read_text(encoding="utf-8"), relative, urls).encode("utf-8")
+        digest = sha256(css)
+        name = fingerprinted(relative, digest)
+        assets[relative] = {
+            "file": f"static/{name}",
+            "sha256": digest,
+            "source_sha256": sha256(source.read_bytes()),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "content": css,
+        }
+        urls[relative] = name
+    return assets, urls
+
+
+def rewrite_css(css, relative, urls):
+    base = os.path.dirname(relative)
+
+    def replace(match):
+        ref = match.group("path").strip()
+        if re.match(r"^[a-z]+:|^//|^#|^/(?!static/)", ref, re.I):
+            return match.group(0)
+        path, sep, rest = ref, "", ""
+        suffix = re.search(r"[?#]", ref)
+        if suffix:
+            path, sep, rest = ref[:suffix.start()], suffix.group(0), ref[suffix.end():]
+        if path.startswith("/static/"):
+            target = path[len("/static/"):]
+        else:
+            target = os.path.normpath(os.path.join(base, path)).replace(os.sep, "/")
+        if target not in urls:
+            return match.group(0)
+        if path.startswith("/static/"):
+            new = "/static/" + urls[target]
+        else:
+            new = os.path.relpath(urls[target], base or ".").replace(os.sep, "/")
+        return f"url({match.group('quote')}{new}{sep}{rest}{match.group('quote')})"
+
+    return _CSS_URL.sub(replace, css)
+
+
+def rewrite_html(html, urls):
+    def replace(match):
+        name = urls.get(match.group("path"))
+        if name is None:
+            return match.group(0)
+        return f"{match.group('prefix')}/static/{name}"
+
+    return _STATIC_REF.sub(replace, html)
+
+
+def _init_worker():
+    global _app
+    from app import create_app
+
+    _app = create_app()
+
+
+def render_page(path):
+    """Fetch one page; returns (path, status, html)."""
+    if _app is None:
+        _init_worker()
+    with _app.test_client() as client:
+        resp = client.get(path, follow_redirects=True)
+        return path, resp.status_code, resp.get_data(as_text=True)
+
+
+def render_pages(paths, workers):
+    if workers <= 1 or len(paths) < PARALLEL_THRESHOLD:
+        return [render_page(p) for p in paths]
+    # Create the schema once up front (workers would race on a fresh database),
+    # then drop the pooled connections so forked workers open their own.
+    from models import db
+
+    if _app is None:
+        _init_worker()
+    with _app.app_context():
+        db.engine.dispose()
+
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(render_page, paths, chunksize=chunksize))
+
+
+def write_if_changed(build_dir, relative, data, digest, previous_digest):
+    """Write data unless the file on disk already has this content. Returns True if written."""
+    target = build_dir / relative
+    if previous_digest == digest and target.is_file():
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, target)
+    return True
+
+
+def remove_stale(build_dir, outputs):
+    removed = 0
+    for path in sorted(build_dir.rglob("*"), reverse=True):
+        relative = path.relative_to(build_dir).as_posix()
+        if path.is_file() and relative not in outputs:
+            path.unlink()
+            removed += 1
+            print(f"Removed {path}")
+        elif path.is_dir() and not any(path.iterdir()):
+            path.rmdir()
+    return removed
+
+
+def cache_headers():
+    return (
+        "/static/*\n"
+        "  Cache-Control: public, max-age=31536000, immutable\n"
+        "/*.html\n"
+        "  Cache-Control: public, max-age=0, must-revalidate\n"
+    ).encode("utf-8")
+
+
+def freeze(paths, build_dir, workers, force=False):
+    build_dir.mkdir(parents=True, exist_ok=True)
+    previous = {} if force else load_manifest(build_dir)
+    previous_files = {
+        entry["file"]: entry["sha256"]
+        for section in ("assets", "pages", "extra")
+        for entry in previous.get(section, {}).values()
+    }
+
+    assets, urls = collect_assets(previous.get("assets", {}))
+    written = unchanged = 0
+
+    def emit(relative, data, digest):
+        nonlocal written, unchanged
+        if write_if_changed(build_dir, relative, data, digest, previous_files.get(relative)):
+            written += 1
+            print(f"Wrote {build_dir / relative}")
+        else:
+            unchanged += 1
+
+    for relative, asset in assets.items():
+        data = asset.pop("content", None)
+        source = asset.pop("source", None)
+        if data is None and not (previous_files.get(asset["file"]) == asset["sha256"]
+                                 and (build_dir / asset["file"]).is_file()):
+            data = source.read_bytes()
+        emit(asset["file"], data, asset["sha256"])
+
+    pages = {}
+    for path, status, html in render_pages(paths, workers):
+        if status != 200:
+            print(f"Skipping {path} (status {status})")
+            continue
+        data = rewrite_html(html, urls).encode("utf-8")
+        entry = {"file": output_name(path), "sha256": sha256(data)}
+        emit(entry["file"], data, entry["sha256"])
+        pages[path] = entry
+
+    headers = cache_headers()
+    extra = {HEADERS_NAME: {"file": HEADERS_NAME, "sha256": sha256(headers)}}
+    emit(HEADERS_NAME, headers, extra[HEADERS_NAME]["sha256"])
+
+    manifest = {"assets": assets, "pages": pages, "extra": extra}
+    outputs = {entry["file"] for section in manifest.values() for entry in section.values()}
+    outputs.add(MANIFEST_NAME)
+    removed = remove_stale(build_dir, outputs)
+
+    manifest_data = (json.dumps(manifest, indent=2, sort_keys=True) + "\n").encode("utf-8")
+    manifest_path = build_dir / MANIFEST_NAME
+    if not manifest_path.is_file() or manifest_path.read_bytes() != manifest_data:
+        manifest_path.write_bytes(manifest_data)
+    return written, unchanged, removed
 
 
 def main():
-    # Pages to export. Add more public routes if you have them.
-    paths = ["/", "/login", "/register"]
-    clean_build()
-    copy_static()
-    export_paths(paths)
-    print(f"Static export complete. See {BUILD_DIR.resolve()}")
+    parser = argparse.ArgumentParser(description="Export the public pages as a static site.")
+    parser.add_argument("--output", default="build", help="build directory (default: build)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes used to render pages")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and rewrite everything")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    build_dir = Path(args.output)
+    written, unchanged, removed = freeze(PATHS, build_dir, args.workers, force=args.force)
+    print(
+        f"Static export complete in {time.perf_counter() - start:.2f}s: {written} written, "
+        f"{unchanged} unchanged, {removed} removed. See {build_dir.resolve()}"
+    )
 
 
 if __name__ == "__main__":
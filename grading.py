@@ -0,0 +1,154 @@
+from sqlalchemy import insert, update
+
+from models import db, Submission, Feedback
+from rollups import record_feedback_changes
+from versions import bump_versions, student_scope, teacher_scope
+
+
+GRADE_FIELDS = (
+    "submission_id",
+    "score",
+    "max_score",
+    "rubric_clarity",
+    "rubric_completion",
+    "rubric_presentation",
+    "comments",
+)
+
+
+class GradeError(ValueError):
+    pass
+
+
+_NUMERIC_FIELDS = (
+    ("score", float, "0"),
+    ("max_score", float, "100"),
+    ("rubric_clarity", int, "3"),
+    ("rubric_completion", int, "3"),
+    ("rubric_presentation", int, "3"),
+)
+
+
+def _present(values, name):
+    value = values.get(name)
+    return value is not None and str(value).strip() != ""
+
+
+def parse_grade(values, partial=False):
+    """Validate grade fields from a form, CSV row or JSON object.
+
+    Applies the same defaults and rules as the single-submission review form.
+    With partial=True, fields missing from values (or blank) are left out of
+    the result instead of defaulted, so an update only touches the fields
+    given. Returns a dict of feedback values or raises GradeError.
+    """
+    grade = {}
+    try:
+        for name, convert, default in _NUMERIC_FIELDS:
+            if partial and not _present(values, name):
+                continue
+            grade[name] = convert(values.get(name, default))
+    except (TypeError, ValueError):
+        raise GradeError("Please enter valid numeric values for scores and rubrics.")
+
+    rubrics = [grade[name] for name in ("rubric_clarity", "rubric_completion", "rubric_presentation") if name in grade]
+    if not all(1 <= value <= 5 for value in rubrics):
+        raise GradeError("Rubric values must be between 1 and 5.")
+
+    if not partial or _present(values, "comments"):
+        grade["comments"] = str(values.get("comments") or "").strip()
+    return grade
+
+
+def apply_grades(assignment_id, teacher_id, rows):
+    """Grade many submissions of one assignment in a single transaction.
+
+    rows is an iterable of mappings with GRADE_FIELDS keys. Columns missing
+    from a row keep their current value on existing feedback and get the
+    review form's defaults on new feedback. Invalid rows are reported and
+    skipped; the valid ones are written with one bulk INSERT, one
+    bulk UPDATE and one status UPDATE. Returns (applied_count, errors) where
+    errors is a list of {"row", "submission_id", "error"} dicts (rows are
+    numbered from 1).
+    """
+    errors = []
+    grades = {}
+
+    for row_number, values in enumerate(rows, start=1):
+        raw_id = values.get("submission_id")
+        try:
+            submission_id = int(raw_id)
+        except (TypeError, ValueError):
+            errors.append({"row": row_number, "submission_id": raw_id, "error": "Missing or invalid submission_id."})
+            continue
+        if submission_id in grades:
+            errors.append({"row": row_number, "submission_id": submission_id, "error": "Duplicate submission_id in batch."})
+            continue
+        try:
+            grades[submission_id] = (row_number, parse_grade(values, partial=True))
+        except GradeError as exc:
+            errors.append({"row": row_number, "submission_id": submission_id, "error": str(exc)})
+
+    if not grades:
+        return 0, errors
+
+    students = dict(
+        db.session.query(Submission.id, Submission.student_id).filter(
+            Submission.assignment_id == assignment_id,
+            Submission.id.in_(grades),
+        )
+    )
+    for submission_id in [sid for sid in grades if sid not in students]:
+        row_number, _ = grades.pop(submission_id)
+        errors.append({
+            "row": row_number,
+            "submission_id": submission_id,
+            "error": "Submission does not belong to this assignment.",
+        })
+
+    if not grades:
+        return 0, errors
+
+    existing = {
+        row.submission_id: row
+        for row in db.session.query(
+            Feedback.id, Feedback.submission_id, Feedback.score, Feedback.max_score
+        ).filter(Feedback.submission_id.in_(grades))
+    }
+
+    defaults = parse_grade({})
+    inserts = []
+    updates = []
+    changes = []
+    for submission_id, (_, values) in grades.items():
+        old = existing.get(submission_id)
+        if old:
+            if values:
+                updates.append({"id": old.id, **values})
+            new = (values.get("score", old.score), values.get("max_score", old.max_score))
+        else:
+            values = {**defaults, **values}
+            inserts.append({"submission_id": submission_id, "teacher_id": teacher_id, **values})
+            new = (values["score"], values["max_score"])
+        changes.append((
+            students[submission_id],
+            assignment_id,
+            (old.score, old.max_score) if old else None,
+            new,
+        ))
+
+    if inserts:
+        db.session.execute(insert(Feedback), inserts)
+    if updates:
+        db.session.execute(update(Feedback), updates)
+    db.session.execute(
+        update(Submission).where(Submission.id.in_(grades)).values(status="graded"),
+        execution_options={"synchronize_session": False},
+    )
+    record_feedback_changes(changes)
+    # The Core statements above bypass the session's before_flush hook.
+    bump_versions({teacher_scope(teacher_id)} | {student_scope(students[sid]) for sid in grades})
+    db.session.commit()
+
+    errors.sort(key=lambda e: e["row"])
+    return len(grades), errors
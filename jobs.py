@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, exists
+from sqlalchemy.orm import aliased
+
+from models import db, Job
+
+
+# A small job queue stored in the application database.
+#
+# Jobs are inserted in the same transaction as the change that caused them, so
+# a committed submission always has its job. Workers claim a job by bumping its
+# attempt counter with a compare-and-set UPDATE and holding a lease until
+# locked_until; a worker that dies mid-job simply lets the lease expire and the
+# job is claimed again (at-least-once delivery, handlers must be idempotent).
+
+
+def enqueue(kind, target_id, group_key=None):
+    """Queue a job unless an identical one is already waiting to run."""
+    pending = Job.query.filter_by(kind=kind, target_id=target_id, status="queued").first()
+    if pending:
+        pending.available_at = min(pending.available_at, datetime.utcnow())
+        return pending
+
+    job = Job(kind=kind, target_id=target_id, group_key=group_key)
+    db.session.add(job)
+    return job
+
+
+def _claimable(now):
+    return or_(
+        and_(Job.status == "queued", Job.available_at <= now),
+        and_(Job.status == "running", Job.locked_until < now),
+    )
+
+
+def _group_free(now):
+    """The job has no group, or no other job of its group holds a live lease."""
+    other = aliased(Job)
+    busy_group = exists().where(
+        other.group_key == Job.group_key,
+        other.id != Job.id,
+        other.status == "running",
+        other.locked_until >= now,
+    )
+    return or_(Job.group_key.is_(None), ~busy_group)
+
+
+def claim(lease_seconds):
+    """Atomically claim the oldest runnable job. Returns the Job or None."""
+    now = datetime.utcnow()
+
+    # Busy groups are filtered out before the LIMIT, so a spike of jobs for one
+    # assignment cannot hide the jobs of every other group.
+    candidates = db.session.query(Job.id, Job.attempts).filter(
+        _claimable(now), _group_free(now)
+    ).order_by(Job.id).limit(20).all()
+    db.session.commit()
+
+    for job_id, attempts in candidates:
+        claimed = Job.query.filter(
+            Job.id == job_id,
+            Job.attempts == attempts,
+            _claimable(now),
+            _group_free(now),
+        ).update(
+            {
+                Job.status: "running",
+                Job.attempts: Job.attempts + 1,
+                Job.locked_until: now + timedelta(seconds=lease_seconds),
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+        if claimed:
+            return Job.query.get(job_id)
+    return None
+
+
+def complete(job):
+    Job.query.filter_by(id=job.id, attempts=job.attempts).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def fail(job, error, max_attempts):
+    """Record a failed attempt, retrying with exponential backoff until max_attempts.
+
+    Returns True if the job has been given up.
+    """
+    db.session.rollback()
+    given_up = job.attempts >= max_attempts
+    if given_up:
+        values = {Job.status: "failed", Job.locked_until: None}
+    else:
+        values = {
+            Job.status: "queued",
+            Job.locked_until: None,
+            Job.available_at: datetime.utcnow() + timedelta(seconds=2 ** job.attempts),
+        }
+    values[Job.last_error] = error
+    Job.query.filter_by(id=job.id, attempts=job.attempts).update(values, synchronize_session=False)
+    db.session.commit()
+    return given_up
@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+
+# Opt-in request instrumentation (METRICS_ENABLED=1).
+#
+# SQLAlchemy cursor events time every statement; Flask request hooks collect
+# them per request and record, per endpoint, the request latency, the number
+# of statements, the total time spent in the database, the slowest statement
+# and the time spent scoring plagiarism. Everything is kept in process memory
+# and rendered in the Prometheus text format by render_metrics(). Requests that
+# are slow or run many statements are logged with their statement list, grouped
+# by SQL text so N+1 patterns stand out.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            snapshot = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in sorted(snapshot):
+            labels = list(zip(self.labelnames, key))
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(labels + [('le', _number(bound))])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_labels(labels + [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+        return "\n".join(lines)
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency.",
+    ("endpoint", "method", "status"), LATENCY_BUCKETS,
+)
+REQUEST_STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements executed per request.",
+    ("endpoint",), COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Total SQL execution time per request.",
+    ("endpoint",), LATENCY_BUCKETS,
+)
+REQUEST_SLOWEST_STATEMENT = Histogram(
+    "http_request_slowest_statement_seconds", "Slowest SQL statement per request.",
+    ("endpoint",), LATENCY_BUCKETS,
+)
+PLAGIARISM_TIME = Histogram(
+    "plagiarism_scoring_seconds", "Time spent scoring plagiarism, per request endpoint or job.",
+    ("endpoint",), LATENCY_BUCKETS,
+)
+
+HISTOGRAMS = [REQUEST_LATENCY, REQUEST_STATEMENTS, REQUEST_DB_TIME, REQUEST_SLOWEST_STATEMENT, PLAGIARISM_TIME]
+
+
+def render_metrics():
+    return "\n".join(histogram.render() for histogram in HISTOGRAMS) + "\n"
+
+
+@contextmanager
+def plagiarism_timer(job=None):
+    """Record the time spent in the block as plagiarism scoring.
+
+    Inside a request the time is attributed to the request's endpoint;
+    elsewhere (the worker, CLI commands) to "job:<job>" when job is given.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = g.get("sql_timings") if has_app_context() else None
+        if timings is not None:
+            g.plagiarism_seconds = g.get("plagiarism_seconds", 0.0) + elapsed
+        elif job is not None:
+            PLAGIARISM_TIME.observe(elapsed, endpoint=f"job:{job}")
+
+
+def _statement_summary(timings, limit):
+    grouped = defaultdict(lambda: [0, 0.0])
+    for statement, elapsed in timings:
+        entry = grouped[" ".join(statement.split())]
+        entry[0] += 1
+        entry[1] += elapsed
+    ordered = sorted(grouped.items(), key=lambda item: item[1][1], reverse=True)
+    lines = [
+        f"  {count}x {total * 1000:.1f} ms  {statement[:300]}"
+        for statement, (count, total) in ordered[:limit]
+    ]
+    if len(ordered) > limit:
+        lines.append(f"  ... {len(ordered) - limit} more distinct statements")
+    return lines
+
+
+def install_instrumentation(app, engine):
+    """Hook SQL timing into engine and per-request metrics into app."""
+    slow_seconds = app.config["SLOW_REQUEST_MS"] / 1000
+    slow_statements = app.config["SLOW_REQUEST_STATEMENTS"]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        timings = g.get("sql_timings") if has_app_context() else None
+        if timings is not None:
+            timings.append((statement, elapsed))
+
+    @app.before_request
+    def start_request():
+        g.request_start = time.perf_counter()
+        g.sql_timings = []
+
+    @app.teardown_request
+    def finish_request(exc):
+        start = g.pop("request_start", None)
+        timings = g.pop("sql_timings", None)
+        if start is None or timings is None:
+            return
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or "unmatched"
+        status = g.pop("response_status", 500 if exc else 200)
+        db_time = sum(t for _, t in timings)
+        slowest = max((t for _, t in timings), default=0.0)
+
+        REQUEST_LATENCY.observe(elapsed, endpoint=endpoint, method=request.method, status=status)
+        REQUEST_STATEMENTS.observe(len(timings), endpoint=endpoint)
+        REQUEST_DB_TIME.observe(db_time, endpoint=endpoint)
+        REQUEST_SLOWEST_STATEMENT.observe(slowest, endpoint=endpoint)
+        plagiarism_seconds = g.pop("plagiarism_seconds", None)
+        if plagiarism_seconds is not None:
+            PLAGIARISM_TIME.observe(plagiarism_seconds, endpoint=endpoint)
+
+        if elapsed >= slow_seconds or len(timings) >= slow_statements:
+            app.logger.warning(
+                "Slow request %s %s (%s): %.1f ms, %d statements, %.1f ms in the database\n%s",
+                request.method, request.path, endpoint, elapsed * 1000, len(timings), db_time * 1000,
+                "\n".join(_statement_summary(timings, limit=20)),
+            )
+
+    @app.after_request
+    def remember_status(response):
+        g.response_status = response.status_code
+        return response
@@ -0,0 +1,151 @@
+from sqlalchemy import func, inspect
+
+from jobs import enqueue
+from models import db, SchemaMigration, Submission, Feedback
+from rollups import rebuild_rollups
+from search import ensure_search_index, rebuild_search_index
+
+
+# Versioned schema migrations.
+#
+# db.create_all() only creates missing tables; it never touches tables that
+# already exist, so databases created by earlier releases need these steps to
+# catch up. Each step runs once, in order, and is recorded in
+# schema_migrations. Steps must also be harmless on a freshly created database,
+# where create_all() has already built everything the models describe.
+#
+# Every process runs upgrade() at startup, so each step (and create_all) runs
+# in one transaction holding a write lock: BEGIN IMMEDIATE on SQLite, an
+# advisory lock on PostgreSQL. A process that waited for the lock re-reads
+# schema_migrations and skips steps another process has just applied. Steps
+# therefore must not commit.
+
+_ADVISORY_LOCK_ID = 0x5A5C4E4D
+
+
+def _create_indexes(*names):
+    wanted = set(names)
+    conn = db.session.connection()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in wanted:
+                index.create(bind=conn, checkfirst=True)
+                wanted.discard(index.name)
+    if wanted:
+        raise RuntimeError(f"Unknown indexes in migration: {', '.join(sorted(wanted))}")
+
+
+def _add_column(model, name):
+    conn = db.session.connection()
+    table = model.__table__
+    existing = {col["name"] for col in inspect(conn).get_columns(table.name)}
+    if name in existing:
+        return
+    column = table.c[name]
+    ddl = f"ALTER TABLE {table.name} ADD COLUMN {name} {column.type.compile(dialect=conn.dialect)}"
+    for fk in column.foreign_keys:
+        ddl += f" REFERENCES {fk.column.table.name} ({fk.column.name})"
+    conn.exec_driver_sql(ddl)
+
+
+def _drop_column(table_name, name):
+    conn = db.session.connection()
+    existing = {col["name"] for col in inspect(conn).get_columns(table_name)}
+    if name in existing:
+        conn.exec_driver_sql(f"ALTER TABLE {table_name} DROP COLUMN {name}")
+
+
+def _ensure_unique(label, columns):
+    duplicates = db.session.query(*columns).group_by(*columns).having(func.count() > 1).limit(10).all()
+    if duplicates:
+        sample = ", ".join(str(tuple(row)) for row in duplicates)
+        raise RuntimeError(
+            f"Cannot add unique index on {label}: duplicate rows exist ({sample}). "
+            "Resolve them manually and restart."
+        )
+
+
+def _add_hot_path_indexes():
+    _ensure_unique("submissions(assignment_id, student_id)", [Submission.assignment_id, Submission.student_id])
+    _ensure_unique("feedback(submission_id)", [Feedback.submission_id])
+    _create_indexes(
+        "ix_assignments_teacher_created",
+        "ix_assignments_due_date",
+        "uq_submissions_assignment_student",
+        "ix_submissions_assignment_submitted",
+        "ix_submissions_student_submitted",
+        "ix_feedback_submission_id",
+        "ix_feedback_teacher_id",
+    )
+
+
+def _add_blob_store_columns():
+    _add_column(Submission, "file_sha256")
+    _create_indexes("ix_submissions_file_path", "ix_submissions_file_sha256")
+
+
+def _queue_plagiarism_backfill():
+    # Signing and rescoring every submission can take most of an hour on a big
+    # database, far too long for startup; the worker does it per assignment
+    # ("flask rebuild-plagiarism-index" does it all at once).
+    assignment_ids = db.session.query(Submission.assignment_id).distinct()
+    for (assignment_id,) in assignment_ids.all():
+        enqueue("rebuild-index", assignment_id, group_key=f"assignment:{assignment_id}")
+
+
+def _add_job_group_index():
+    _create_indexes("ix_jobs_group_status")
+
+
+def _drop_stored_rosters():
+    # Early roster imports kept the uploaded CSV, plaintext passwords included,
+    # in roster_imports.csv_text. Imports still pending lose their file and fail.
+    _drop_column("roster_imports", "csv_text")
+
+
+def _create_search_index():
+    # Without SQLite FTS5 search stays unavailable; "flask rebuild-search-index"
+    # creates the index later if the database gains it.
+    if ensure_search_index():
+        rebuild_search_index()
+
+
+MIGRATIONS = [
+    (1, "Index foreign keys and hot lookup paths", _add_hot_path_indexes),
+    (2, "Backfill grade rollups", rebuild_rollups),
+    (3, "Content-addressed upload store", _add_blob_store_columns),
+    (4, "Full-text search index", _create_search_index),
+    (5, "Queue the plagiarism index backfill", _queue_plagiarism_backfill),
+    (6, "Index job groups", _add_job_group_index),
+    (7, "Drop stored roster uploads", _drop_stored_rosters),
+]
+
+
+def _lock_schema():
+    """Start a transaction that holds the migration lock until commit or rollback."""
+    db.session.rollback()
+    conn = db.session.connection()
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    elif conn.dialect.name == "postgresql":
+        conn.exec_driver_sql("SELECT pg_advisory_xact_lock(%s)" % _ADVISORY_LOCK_ID)
+    return conn
+
+
+def upgrade():
+    """Create missing tables and apply pending migrations. Returns the list of versions applied."""
+    conn = _lock_schema()
+    db.metadata.create_all(bind=conn)
+    db.session.commit()
+
+    done = []
+    for version, description, step in MIGRATIONS:
+        _lock_schema()
+        if db.session.get(SchemaMigration, version) is not None:
+            db.session.rollback()
+            continue
+        step()
+        db.session.add(SchemaMigration(version=version, description=description))
+        db.session.commit()
+        done.append(version)
+    return done
@@ -23,11 +23,14 @@ class User(db.Model):
 
 class Assignment(db.Model):
     __tablename__ = "assignments"
+    __table_args__ = (
+        db.Index("ix_assignments_teacher_created", "teacher_id", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(150), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    due_date = db.Column(db.DateTime, nullable=False)
+    due_date = db.Column(db.DateTime, nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     teacher_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -38,19 +41,38 @@ class Assignment(db.Model):
         return f"<Assignment {self.title}>"
 
 
+class Blob(db.Model):
+    __tablename__ = "blobs"
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Blob {self.sha256[:12]} refs={self.refcount}>"
+
+
 class Submission(db.Model):
     __tablename__ = "submissions"
+    __table_args__ = (
+        db.Index("uq_submissions_assignment_student", "assignment_id", "student_id", unique=True),
+        db.Index("ix_submissions_assignment_submitted", "assignment_id", "submitted_at", "id"),
+        db.Index("ix_submissions_student_submitted", "student_id", "submitted_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     assignment_id = db.Column(db.Integer, db.ForeignKey("assignments.id"), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
 
     text_response = db.Column(db.Text, nullable=True)
-    file_path = db.Column(db.String(255), nullable=True)
+    file_path = db.Column(db.String(255), nullable=True, index=True)
+    file_sha256 = db.Column(db.String(64), db.ForeignKey("blobs.sha256"), nullable=True, index=True)
 
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default="submitted")  # submitted / graded
-    plagiarism_score = db.Column(db.Float, default=0.0)  # 0-100 %
+    plagiarism_score = db.Column(db.Float, nullable=True)  # 0-100 %, None while pending
 
     feedback = db.relationship("Feedback", backref="submission", uselist=False)
 
@@ -62,8 +84,8 @@ class Feedback(db.Model):
     __tablename__ = "feedback"
 
     id = db.Column(db.Integer, primary_key=True)
-    submission_id = db.Column(db.Integer, db.ForeignKey("submissions.id"), nullable=False)
-    teacher_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    submission_id = db.Column(db.Integer, db.ForeignKey("submissions.id"), nullable=False, unique=True, index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
 
     score = db.Column(db.Float, nullable=False)
     max_score = db.Column(db.Float, nullable=False)
@@ -79,3 +101,166 @@ class Feedback(db.Model):
 
     def __repr__(self):
         return f"<Feedback submission={self.submission_id} score={self.score}>"
+
+
+class SubmissionSignature(db.Model):
+    __tablename__ = "submission_signatures"
+
+    submission_id = db.Column(db.Integer, db.ForeignKey("submissions.id"), primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey("assignments.id"), nullable=False, index=True)
+
+    minhash = db.Column(db.LargeBinary, nullable=False)  # packed uint64 MinHash signature
+    token_count = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SubmissionSignature submission={self.submission_id}>"
+
+
+class LshBucket(db.Model):
+    __tablename__ = "lsh_buckets"
+    __table_args__ = (
+        db.Index("ix_lsh_buckets_assignment_bucket", "assignment_id", "bucket"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey("assignments.id"), nullable=False)
+    bucket = db.Column(db.BigInteger, nullable=False)
+    submission_id = db.Column(db.Integer, db.ForeignKey("submissions.id"), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<LshBucket assignment={self.assignment_id} submission={self.submission_id}>"
+
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        db.Index("ix_jobs_status_available", "status", "available_at"),
+        db.Index("ix_jobs_kind_target", "kind", "target_id"),
+        db.Index("ix_jobs_group_status", "group_key", "status"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    group_key = db.Column(db.String(100), nullable=True)  # jobs sharing a key never run concurrently
+
+    status = db.Column(db.String(20), nullable=False, default="queued")  # queued / running / failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Job {self.kind} target={self.target_id} status={self.status}>"
+
+
+class SchemaMigration(db.Model):
+    __tablename__ = "schema_migrations"
+
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SchemaMigration {self.version}>"
+
+
+class StudentGradeRollup(db.Model):
+    __tablename__ = "student_grade_rollups"
+
+    student_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    graded_count = db.Column(db.Integer, nullable=False, default=0)
+    total_score = db.Column(db.Float, nullable=False, default=0.0)
+    total_max = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<StudentGradeRollup student={self.student_id} graded={self.graded_count}>"
+
+
+class AssignmentGradeRollup(db.Model):
+    __tablename__ = "assignment_grade_rollups"
+
+    assignment_id = db.Column(db.Integer, db.ForeignKey("assignments.id"), primary_key=True)
+    graded_count = db.Column(db.Integer, nullable=False, default=0)
+    total_score = db.Column(db.Float, nullable=False, default=0.0)
+    total_max = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<AssignmentGradeRollup assignment={self.assignment_id} graded={self.graded_count}>"
+
+
+class DataVersion(db.Model):
+    __tablename__ = "data_versions"
+
+    scope = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DataVersion {self.scope}={self.version}>"
+
+
+class SimilarityReport(db.Model):
+    __tablename__ = "similarity_reports"
+
+    assignment_id = db.Column(db.Integer, db.ForeignKey("assignments.id"), primary_key=True)
+    data_version = db.Column(db.Integer, nullable=False)  # "assignment:<id>" version the results were built from
+    submission_count = db.Column(db.Integer, nullable=False)
+    cluster_count = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SimilarityReport assignment={self.assignment_id} version={self.data_version}>"
+
+
+class SimilarityNeighbour(db.Model):
+    __tablename__ = "similarity_neighbours"
+    __table_args__ = (
+        db.Index("ix_similarity_neighbours_submission_rank", "submission_id", "rank"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey("assignments.id"), nullable=False, index=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey("submissions.id"), nullable=False)
+    neighbour_id = db.Column(db.Integer, db.ForeignKey("submissions.id"), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)  # 1 = most similar
+    similarity = db.Column(db.Float, nullable=False)  # 0-100 %
+
+    def __repr__(self):
+        return f"<SimilarityNeighbour {self.submission_id}->{self.neighbour_id} {self.similarity}>"
+
+
+class SimilarityCluster(db.Model):
+    __tablename__ = "similarity_clusters"
+    __table_args__ = (
+        db.Index("ix_similarity_clusters_assignment_cluster", "assignment_id", "cluster"),
+    )
+
+    submission_id = db.Column(db.Integer, db.ForeignKey("submissions.id"), primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey("assignments.id"), nullable=False)
+    cluster = db.Column(db.Integer, nullable=False)  # numbered from 1 per assignment, largest first
+
+    def __repr__(self):
+        return f"<SimilarityCluster submission={self.submission_id} cluster={self.cluster}>"
+
+
+class RosterImport(db.Model):
+    __tablename__ = "roster_imports"
+
+    id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)  # the file itself is kept outside the database
+
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+    processed_rows = db.Column(db.Integer, nullable=False, default=0)
+    created_count = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text, nullable=True)  # JSON list of {"row", "email", "error"}
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<RosterImport {self.id} {self.processed_rows}/{self.total_rows}>"
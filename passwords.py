@@ -0,0 +1,73 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+# Password hashing off the request threads.
+#
+# Hashing is deliberately slow. If every request thread hashed inline, a burst
+# of logins (start of term) would occupy every CPU and starve the other routes.
+# PasswordHasher runs hashes on a small pool of its own instead; hashlib's
+# scrypt and pbkdf2 release the GIL, so threads are enough. At most `workers`
+# hashes run at a time and at most `max_pending` more may wait. Beyond that
+# HasherBusy is raised immediately, so callers can answer "try again" instead of
+# queueing requests that would time out anyway. The limits are per process: a
+# host running several app processes hashes up to workers x processes at once.
+#
+# The cost is set by PASSWORD_HASH_METHOD (any werkzeug method string, e.g.
+# "scrypt:32768:8:1" or "pbkdf2:sha256:600000"). Hashes made with another method
+# or cost are replaced on the user's next successful login (see needs_rehash).
+
+DEFAULT_METHOD = "scrypt:32768:8:1"
+
+
+class HasherBusy(Exception):
+    """Too many password hashes are already running or queued."""
+
+
+def hash_password(password, method=DEFAULT_METHOD):
+    return generate_password_hash(password, method=method)
+
+
+@lru_cache(maxsize=None)
+def _method_prefix(method):
+    # werkzeug fills in default parameters ("scrypt" -> "scrypt:32768:8:1"), so
+    # ask it for the exact prefix a new hash would get.
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
+def needs_rehash(password_hash, method=DEFAULT_METHOD):
+    """True if password_hash was not made with method (including its cost parameters)."""
+    return password_hash.split("$", 1)[0] != _method_prefix(method)
+
+
+class PasswordHasher:
+    def __init__(self, method=DEFAULT_METHOD, workers=1, max_pending=0):
+        self.method = method
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._run(hash_password, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return needs_rehash(password_hash, self.method)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
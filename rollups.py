@@ -0,0 +1,83 @@
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+
+from database import upsert
+from models import db, Submission, Feedback, StudentGradeRollup, AssignmentGradeRollup
+
+
+# Per-student and per-assignment grade totals, kept up to date in the same
+# transaction as every Feedback insert or edit so analytics pages can read
+# them instead of summing every Feedback row on each view.
+
+
+def _apply_delta(model, key_column, key, count, score, max_score):
+    # One upsert: two transactions creating the same rollup row both succeed.
+    upsert(
+        db.session, model, key_column,
+        [{
+            key_column.key: key,
+            "graded_count": count,
+            "total_score": score,
+            "total_max": max_score,
+            "updated_at": datetime.utcnow(),
+        }],
+        add=("graded_count", "total_score", "total_max"),
+        replace=("updated_at",),
+    )
+
+
+def record_feedback_change(student_id, assignment_id, old=None, new=None):
+    """Apply a feedback change to the rollups.
+
+    old and new are (score, max_score) pairs, or None when the feedback did
+    not exist before / does not exist after the change.
+    """
+    record_feedback_changes([(student_id, assignment_id, old, new)])
+
+
+def record_feedback_changes(changes):
+    """Apply many (student_id, assignment_id, old, new) changes with one update per rollup row."""
+    by_student = defaultdict(lambda: [0, 0.0, 0.0])
+    by_assignment = defaultdict(lambda: [0, 0.0, 0.0])
+
+    for student_id, assignment_id, old, new in changes:
+        delta = (
+            (new is not None) - (old is not None),
+            (new[0] if new else 0.0) - (old[0] if old else 0.0),
+            (new[1] if new else 0.0) - (old[1] if old else 0.0),
+        )
+        for totals in (by_student[student_id], by_assignment[assignment_id]):
+            for i, value in enumerate(delta):
+                totals[i] += value
+
+    for student_id, delta in by_student.items():
+        if any(delta):
+            _apply_delta(StudentGradeRollup, StudentGradeRollup.student_id, student_id, *delta)
+    for assignment_id, delta in by_assignment.items():
+        if any(delta):
+            _apply_delta(AssignmentGradeRollup, AssignmentGradeRollup.assignment_id, assignment_id, *delta)
+
+
+def _rollup_select(key_column):
+    return select(
+        key_column,
+        func.count(Feedback.id),
+        func.coalesce(func.sum(Feedback.score), 0.0),
+        func.coalesce(func.sum(Feedback.max_score), 0.0),
+        func.now(),
+    ).select_from(Feedback).join(Submission, Submission.id == Feedback.submission_id).group_by(key_column)
+
+
+def rebuild_rollups():
+    """Recompute every rollup from the Feedback table (the caller commits)."""
+    columns = ["graded_count", "total_score", "total_max", "updated_at"]
+    db.session.query(StudentGradeRollup).delete(synchronize_session=False)
+    db.session.query(AssignmentGradeRollup).delete(synchronize_session=False)
+    db.session.execute(
+        insert(StudentGradeRollup).from_select(["student_id", *columns], _rollup_select(Submission.student_id))
+    )
+    db.session.execute(
+        insert(AssignmentGradeRollup).from_select(["assignment_id", *columns], _rollup_select(Submission.assignment_id))
+    )
@@ -0,0 +1,214 @@
+import csv
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice, repeat
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, RosterImport, User
+from passwords import DEFAULT_METHOD, hash_password
+
+
+# Bulk account import.
+#
+# The CSV is read as a stream and handled in batches: each batch is validated,
+# checked against existing accounts with one IN query, hashed on a process pool
+# (password hashing is deliberately slow) and inserted with one executemany in
+# its own transaction, so a failure loses one batch at most.
+#
+# Uploads from the web are imported by the worker (run_roster_import), which
+# records progress on a RosterImport row with every batch. The uploaded file
+# holds plaintext passwords, so it never enters the database: it is written to
+# a private spool folder and deleted as soon as the import finishes or is given
+# up (expire_roster_uploads catches anything left behind).
+
+ROSTER_FIELDS = ("name", "email", "password", "role")
+ROLES = ("student", "teacher")
+
+_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_NAME_MAX = User.__table__.c.name.type.length
+_EMAIL_MAX = User.__table__.c.email.type.length
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _validate(row_number, values, allowed_roles, seen):
+    name = str(values.get("name") or "").strip()
+    email = str(values.get("email") or "").strip().lower()
+    password = str(values.get("password") or "")
+    role = str(values.get("role") or "student").strip().lower()
+
+    if not name or not email or not password:
+        return None, "Name, email and password are required."
+    if len(name) > _NAME_MAX or len(email) > _EMAIL_MAX:
+        return None, "Name or email is too long."
+    if not _EMAIL.match(email):
+        return None, "Invalid email address."
+    if role not in allowed_roles:
+        return None, f"Role must be one of: {', '.join(allowed_roles)}."
+    if email in seen:
+        return None, f"Duplicate email in file (first seen on row {seen[email]})."
+    seen[email] = row_number
+    return {"name": name, "email": email, "password": password, "role": role}, None
+
+
+def import_roster(rows, allowed_roles=ROLES, batch_size=500, workers=1, method=DEFAULT_METHOD,
+                  start_row=0, on_batch=None):
+    """Create accounts from an iterable of mappings with ROSTER_FIELDS keys.
+
+    role defaults to "student" and passwords are hashed with method (see
+    passwords.py). Invalid rows and emails that are already registered are
+    reported and skipped. Returns (created_count, errors) where errors is a
+    list of {"row", "email", "error"} dicts (rows numbered from 1, counting on
+    from start_row when resuming). on_batch(rows_done, created, batch_errors),
+    if given, is called after every batch inside the batch's transaction.
+    """
+    errors = []
+    seen = {}
+    created = 0
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    try:
+        row_number = start_row
+        for batch in _batches(rows, batch_size):
+            batch_errors = []
+            valid = []
+            for values in batch:
+                row_number += 1
+                account, error = _validate(row_number, values, allowed_roles, seen)
+                if error:
+                    batch_errors.append({"row": row_number, "email": values.get("email"), "error": error})
+                else:
+                    valid.append((row_number, account))
+            valid = _unregistered(valid, batch_errors)
+            # End the read transaction: holding its snapshot through the slow
+            # hashing step would make the insert fail if anyone else wrote.
+            db.session.rollback()
+
+            if valid:
+                passwords = [account.pop("password") for _, account in valid]
+                if pool:
+                    hashes = pool.map(
+                        hash_password, passwords, repeat(method), chunksize=max(1, len(passwords) // (workers * 4)),
+                    )
+                else:
+                    hashes = map(hash_password, passwords, repeat(method))
+                for (_, account), password_hash in zip(valid, hashes):
+                    account["password_hash"] = password_hash
+
+                try:
+                    db.session.execute(insert(User), [account for _, account in valid])
+                except IntegrityError:
+                    # Someone registered one of these emails since the check.
+                    db.session.rollback()
+                    valid = _unregistered(valid, batch_errors)
+                    if valid:
+                        db.session.execute(insert(User), [account for _, account in valid])
+                created += len(valid)
+
+            errors.extend(batch_errors)
+            if on_batch is not None:
+                on_batch(row_number, created, batch_errors)
+            db.session.commit()
+    finally:
+        if pool:
+            pool.shutdown()
+
+    errors.sort(key=lambda e: e["row"])
+    return created, errors
+
+
+def roster_upload_path(folder, import_id):
+    return os.path.join(folder, f"{import_id}.csv")
+
+
+def save_roster_upload(folder, import_id, text):
+    """Write an uploaded roster where only this user can read it."""
+    os.makedirs(folder, mode=0o700, exist_ok=True)
+    fd = os.open(roster_upload_path(folder, import_id), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with open(fd, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+
+
+def discard_roster_upload(folder, import_id):
+    try:
+        os.remove(roster_upload_path(folder, import_id))
+    except FileNotFoundError:
+        pass
+
+
+def expire_roster_uploads(folder, max_age_seconds):
+    """Delete uploaded rosters older than max_age_seconds. Returns the number removed."""
+    if not os.path.isdir(folder):
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+
+def run_roster_import(import_id, folder, batch_size=500, workers=1, method=DEFAULT_METHOD):
+    """Background job: import the students of a RosterImport, recording progress as it goes.
+
+    Progress is committed with each batch, so a retried job carries on after the
+    last batch that was inserted. The uploaded file is deleted once it is done.
+    """
+    roster_import = db.session.get(RosterImport, import_id)
+    if roster_import is None or roster_import.finished_at is not None:
+        discard_roster_upload(folder, import_id)
+        return
+    start_row = roster_import.processed_rows
+    previous_created = roster_import.created_count
+    previous_errors = json.loads(roster_import.errors or "[]")
+
+    def record_progress(rows_done, created, batch_errors):
+        previous_errors.extend(batch_errors)
+        previous_errors.sort(key=lambda e: e["row"])
+        RosterImport.query.filter_by(id=import_id).update({
+            "processed_rows": rows_done,
+            "created_count": previous_created + created,
+            "errors": json.dumps(previous_errors),
+        })
+
+    with open(roster_upload_path(folder, import_id), encoding="utf-8", newline="") as f:
+        import_roster(
+            islice(csv.DictReader(f), start_row, None), allowed_roles=("student",), batch_size=batch_size,
+            workers=workers, method=method, start_row=start_row, on_batch=record_progress,
+        )
+    RosterImport.query.filter_by(id=import_id).update({"finished_at": datetime.utcnow()})
+    db.session.commit()
+    discard_roster_upload(folder, import_id)
+
+
+def _unregistered(valid, errors):
+    """Drop (and report) rows whose email already has an account, with one IN query."""
+    if not valid:
+        return valid
+    registered = set(db.session.execute(
+        select(User.email).where(User.email.in_([account["email"] for _, account in valid]))
+    ).scalars())
+    kept = []
+    for row_number, account in valid:
+        if account["email"] in registered:
+            errors.append({"row": row_number, "email": account["email"], "error": "Email already registered."})
+        else:
+            kept.append((row_number, account))
+    return kept
@@ -0,0 +1,209 @@
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db
+
+
+# Full-text search over assignments, submissions and feedback (SQLite FTS5).
+#
+# search_index holds one row per assignment (title/description), submission
+# (student name/text) and feedback (student name/comments). Triggers on the
+# source tables keep it in sync inside the writing transaction, so bulk Core
+# statements are covered as well as ORM flushes. rowid is derived from the
+# source row (id * 4 + kind) so triggers can replace a row by rowid.
+#
+# The "scope" column holds a "t<teacher_id>" token. Queries match it together
+# with the search terms, so FTS5 intersects posting lists instead of ranking
+# every match in the system and then throwing away other teachers' rows.
+
+SEARCH_KINDS = ("assignment", "submission", "feedback")
+
+_ASSIGNMENT, _SUBMISSION, _FEEDBACK = 1, 2, 3
+
+# Private-use characters mark highlights, so matched text can be escaped
+# before it is wrapped in <mark>.
+_MARK_START = "\ue000"
+_MARK_END = "\ue001"
+
+_CREATE_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    scope, title, body,
+    kind UNINDEXED, ref_id UNINDEXED, assignment_id UNINDEXED,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+)
+"""
+
+_ASSIGNMENT_ROW = f"""
+INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, assignment_id)
+VALUES (new.id * 4 + {_ASSIGNMENT}, 't' || new.teacher_id, new.title, new.description,
+        'assignment', new.id, new.id);
+"""
+
+_SUBMISSION_ROW = f"""
+INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, assignment_id)
+VALUES (new.id * 4 + {_SUBMISSION},
+        't' || (SELECT teacher_id FROM assignments WHERE id = new.assignment_id),
+        (SELECT name FROM users WHERE id = new.student_id), new.text_response,
+        'submission', new.id, new.assignment_id);
+"""
+
+_FEEDBACK_ROW = f"""
+INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, assignment_id)
+SELECT new.id * 4 + {_FEEDBACK}, 't' || a.teacher_id, u.name, new.comments,
+       'feedback', s.id, s.assignment_id
+FROM submissions s JOIN assignments a ON a.id = s.assignment_id JOIN users u ON u.id = s.student_id
+WHERE s.id = new.submission_id;
+"""
+
+_TRIGGERS = {
+    "search_assignments_ai": f"AFTER INSERT ON assignments BEGIN {_ASSIGNMENT_ROW} END",
+    "search_assignments_au": (
+        "AFTER UPDATE OF title, description, teacher_id ON assignments BEGIN "
+        f"DELETE FROM search_index WHERE rowid = old.id * 4 + {_ASSIGNMENT}; {_ASSIGNMENT_ROW} END"
+    ),
+    "search_assignments_ad": (
+        f"AFTER DELETE ON assignments BEGIN DELETE FROM search_index WHERE rowid = old.id * 4 + {_ASSIGNMENT}; END"
+    ),
+    "search_submissions_ai": f"AFTER INSERT ON submissions BEGIN {_SUBMISSION_ROW} END",
+    "search_submissions_au": (
+        "AFTER UPDATE OF text_response, assignment_id, student_id ON submissions BEGIN "
+        f"DELETE FROM search_index WHERE rowid = old.id * 4 + {_SUBMISSION}; {_SUBMISSION_ROW} END"
+    ),
+    "search_submissions_ad": (
+        f"AFTER DELETE ON submissions BEGIN DELETE FROM search_index WHERE rowid = old.id * 4 + {_SUBMISSION}; END"
+    ),
+    "search_feedback_ai": f"AFTER INSERT ON feedback BEGIN {_FEEDBACK_ROW} END",
+    "search_feedback_au": (
+        "AFTER UPDATE OF comments, submission_id ON feedback BEGIN "
+        f"DELETE FROM search_index WHERE rowid = old.id * 4 + {_FEEDBACK}; {_FEEDBACK_ROW} END"
+    ),
+    "search_feedback_ad": (
+        f"AFTER DELETE ON feedback BEGIN DELETE FROM search_index WHERE rowid = old.id * 4 + {_FEEDBACK}; END"
+    ),
+}
+
+_BACKFILL = [
+    f"""
+    INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, assignment_id)
+    SELECT id * 4 + {_ASSIGNMENT}, 't' || teacher_id, title, description, 'assignment', id, id
+    FROM assignments
+    """,
+    f"""
+    INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, assignment_id)
+    SELECT s.id * 4 + {_SUBMISSION}, 't' || a.teacher_id, u.name, s.text_response,
+           'submission', s.id, s.assignment_id
+    FROM submissions s JOIN assignments a ON a.id = s.assignment_id JOIN users u ON u.id = s.student_id
+    """,
+    f"""
+    INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, assignment_id)
+    SELECT f.id * 4 + {_FEEDBACK}, 't' || a.teacher_id, u.name, f.comments,
+           'feedback', s.id, s.assignment_id
+    FROM feedback f JOIN submissions s ON s.id = f.submission_id
+    JOIN assignments a ON a.id = s.assignment_id JOIN users u ON u.id = s.student_id
+    """,
+]
+
+
+def _is_sqlite():
+    return db.session.get_bind().dialect.name == "sqlite"
+
+
+def search_available():
+    """True once the index exists; it is skipped on databases without SQLite FTS5."""
+    if not _is_sqlite():
+        return False
+    return db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")
+    ).first() is not None
+
+
+def ensure_search_index():
+    """Create the FTS5 table and its triggers if they do not exist. Returns False without SQLite FTS5."""
+    if not _is_sqlite():
+        return False
+    conn = db.session.connection()
+    try:
+        conn.exec_driver_sql(_CREATE_TABLE)
+    except OperationalError as exc:
+        if "fts5" in str(exc):
+            return False
+        raise
+    for name, body in _TRIGGERS.items():
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    return True
+
+
+def rebuild_search_index():
+    """Repopulate the index from the source tables (the caller commits). Returns the number of rows indexed."""
+    if not ensure_search_index():
+        raise RuntimeError("Full-text search needs SQLite with the FTS5 extension.")
+    conn = db.session.connection()
+    conn.exec_driver_sql("DELETE FROM search_index")
+    for statement in _BACKFILL:
+        conn.exec_driver_sql(statement)
+    conn.exec_driver_sql("INSERT INTO search_index (search_index) VALUES ('optimize')")
+    return conn.exec_driver_sql("SELECT count(*) FROM search_index").scalar()
+
+
+def build_match(query, teacher_id):
+    """Turn free text into an FTS5 query scoped to one teacher, or None if it has no terms.
+
+    Every word is quoted, so FTS5 operators in user input are searched for
+    literally instead of being interpreted. A trailing * on a word of three or
+    more characters keeps prefix matching; it is opt-in because a short prefix
+    expands to many terms and is much slower than an exact match.
+    """
+    terms = re.findall(r"(\w+)(\*?)", query)[:16]
+    if not terms:
+        return None
+    quoted = " AND ".join(
+        f'"{term}"*' if star and len(term) >= 3 else f'"{term}"'
+        for term, star in terms
+    )
+    return f"scope : t{int(teacher_id)} AND {{title body}} : ({quoted})"
+
+
+def _highlighted(value):
+    if value is None:
+        return Markup("")
+    return Markup(
+        str(escape(value)).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+    )
+
+
+def search(teacher_id, query, kind=None, limit=50):
+    """Ranked, highlighted matches within one teacher's assignments.
+
+    Returns a list of dicts with kind, ref_id, assignment_id, title and
+    snippet (the last two are Markup with <mark> around matched terms).
+    """
+    match = build_match(query, teacher_id)
+    if match is None:
+        return []
+
+    sql = f"""
+        SELECT kind, ref_id, assignment_id,
+               highlight(search_index, 1, :start, :end) AS title,
+               snippet(search_index, 2, :start, :end, '…', 24) AS snippet
+        FROM search_index
+        WHERE search_index MATCH :match {"AND kind = :kind" if kind else ""}
+        ORDER BY bm25(search_index, 0.0, 4.0, 1.0)
+        LIMIT :limit
+    """
+    params = {"start": _MARK_START, "end": _MARK_END, "match": match, "limit": limit}
+    if kind:
+        params["kind"] = kind
+    rows = db.session.execute(text(sql), params)
+    return [
+        {
+            "kind": row.kind,
+            "ref_id": row.ref_id,
+            "assignment_id": row.assignment_id,
+            "title": _highlighted(row.title),
+            "snippet": _highlighted(row.snippet),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,204 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sqlalchemy import delete, insert
+
+from metrics import plagiarism_timer
+from models import db, Job, User, Submission, SimilarityReport, SimilarityNeighbour, SimilarityCluster
+from plagiarism import tokenize
+from versions import assignment_scope, current_versions
+
+
+# Assignment-wide pairwise similarity, computed on demand by the worker.
+#
+# Every submission's word set (the same tokens plagiarism.py uses) becomes a row
+# of a sparse 0/1 matrix X. X @ X.T counts the shared words of every pair, so
+# the exact Jaccard similarity |A & B| / (|A| + |B| - |A & B|) of all pairs is a
+# few sparse products instead of n**2 Python set intersections. The product is
+# taken in row blocks so that at most BLOCK_CELLS similarities are held in
+# memory at once.
+#
+# The top SIMILARITY_TOP_K neighbours of every submission are stored, and
+# submissions linked by a similarity of at least SIMILARITY_CLUSTER_PERCENT are
+# grouped into clusters (connected components). The report records the
+# "assignment:<id>" data version it was built from; it stays current until a
+# submission's text changes, and a job for a current report does nothing.
+
+BLOCK_CELLS = 4_000_000
+
+
+def token_matrix(texts):
+    """Sparse (len(texts) x vocabulary) 0/1 matrix of the word sets of texts."""
+    vocabulary = {}
+    indices = []
+    indptr = [0]
+    for text in texts:
+        indices.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(text))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float32)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(texts), len(vocabulary)))
+
+
+def similarity_blocks(matrix):
+    """Yield (start, block) where block holds the Jaccard similarity of rows start.. against all rows.
+
+    The diagonal (a submission against itself) is set to -1.
+    """
+    count = matrix.shape[0]
+    sizes = np.asarray(matrix.sum(axis=1), dtype=np.float32).ravel()
+    transposed = matrix.T.tocsc()
+    step = max(1, BLOCK_CELLS // max(count, 1))
+    for start in range(0, count, step):
+        stop = min(count, start + step)
+        shared = (matrix[start:stop] @ transposed).toarray()
+        union = sizes[start:stop, None] + sizes[None, :] - shared
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block = np.where(union > 0, shared / union, 0).astype(np.float32)
+        block[np.arange(stop - start), np.arange(start, stop)] = -1
+        yield start, block
+
+
+def pairwise_similarity(texts, top_k, cluster_threshold):
+    """Top neighbours and clusters for texts, all indexes into texts.
+
+    Returns (neighbours, labels): neighbours[i] is a list of (j, similarity)
+    with similarity in 0-1, best first and excluding zero similarities; labels[i]
+    is i's cluster number, where rows sharing a number are linked by a chain of
+    pairs at least cluster_threshold similar.
+    """
+    matrix = token_matrix(texts)
+    count = matrix.shape[0]
+    k = min(top_k, count - 1)
+    neighbours = [[] for _ in range(count)]
+    edge_rows, edge_cols = [], []
+
+    for start, block in similarity_blocks(matrix):
+        if k > 0:
+            top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            top_similarity = np.take_along_axis(block, top, axis=1)
+            order = np.argsort(-top_similarity, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_similarity = np.take_along_axis(top_similarity, order, axis=1)
+            for offset, (columns, values) in enumerate(zip(top.tolist(), top_similarity.tolist())):
+                neighbours[start + offset] = [(j, v) for j, v in zip(columns, values) if v > 0]
+
+        rows, cols = np.nonzero(block >= cluster_threshold)
+        edge_rows.append(rows + start)
+        edge_cols.append(cols)
+
+    rows = np.concatenate(edge_rows) if edge_rows else np.empty(0, dtype=np.int64)
+    cols = np.concatenate(edge_cols) if edge_cols else np.empty(0, dtype=np.int64)
+    graph = sparse.coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(count, count))
+    _, labels = connected_components(graph, directed=False)
+    return neighbours, labels
+
+
+def _numbered_clusters(labels):
+    """Map component labels to cluster numbers (1 = largest); singletons get None."""
+    if not len(labels):
+        return []
+    components, sizes = np.unique(labels, return_counts=True)
+    order = np.argsort(-sizes, kind="stable")
+    ranked = components[order][sizes[order] > 1]
+    numbers = {component: number for number, component in enumerate(ranked.tolist(), start=1)}
+    return [numbers.get(label) for label in labels.tolist()]
+
+
+@plagiarism_timer(job="similarity")
+def compute_similarity(assignment_id, top_k=5, cluster_percent=60.0):
+    """Background job: rebuild the similarity report of an assignment unless it is current."""
+    scope = assignment_scope(assignment_id)
+    version = current_versions([scope])[scope]
+    report = db.session.get(SimilarityReport, assignment_id)
+    if report is not None and report.data_version == version:
+        return report
+
+    rows = db.session.query(Submission.id, Submission.text_response).filter(
+        Submission.assignment_id == assignment_id,
+        Submission.text_response.isnot(None),
+    ).order_by(Submission.id).all()
+    rows = [row for row in rows if tokenize(row.text_response)]
+    ids = [row.id for row in rows]
+    neighbours, labels = pairwise_similarity(
+        [row.text_response for row in rows], top_k, cluster_percent / 100,
+    )
+    clusters = _numbered_clusters(labels)
+
+    db.session.execute(delete(SimilarityNeighbour).where(SimilarityNeighbour.assignment_id == assignment_id))
+    db.session.execute(delete(SimilarityCluster).where(SimilarityCluster.assignment_id == assignment_id))
+    neighbour_rows = [
+        {
+            "assignment_id": assignment_id,
+            "submission_id": ids[i],
+            "neighbour_id": ids[j],
+            "rank": rank,
+            "similarity": round(similarity * 100, 2),
+        }
+        for i, row in enumerate(neighbours)
+        for rank, (j, similarity) in enumerate(row, start=1)
+    ]
+    if neighbour_rows:
+        db.session.execute(insert(SimilarityNeighbour), neighbour_rows)
+    cluster_rows = [
+        {"assignment_id": assignment_id, "submission_id": submission_id, "cluster": number}
+        for submission_id, number in zip(ids, clusters)
+        if number is not None
+    ]
+    if cluster_rows:
+        db.session.execute(insert(SimilarityCluster), cluster_rows)
+
+    if report is None:
+        report = SimilarityReport(assignment_id=assignment_id)
+        db.session.add(report)
+    report.data_version = version
+    report.submission_count = len(ids)
+    report.cluster_count = max((number for number in clusters if number is not None), default=0)
+    return report
+
+
+def similarity_overview(assignment_id, submission_ids, neighbours_shown=3, clusters_shown=20):
+    """What assignment_detail shows: report status, clusters and the closest matches of submission_ids."""
+    scope = assignment_scope(assignment_id)
+    report = db.session.get(SimilarityReport, assignment_id)
+    pending = db.session.query(Job.id).filter(
+        Job.kind == "similarity", Job.target_id == assignment_id, Job.status.in_(("queued", "running")),
+    ).first() is not None
+
+    clusters = {}
+    matches = {}
+    if report is not None:
+        members = db.session.query(SimilarityCluster.cluster, Submission.id, User.name).join(
+            Submission, Submission.id == SimilarityCluster.submission_id
+        ).join(
+            User, User.id == Submission.student_id
+        ).filter(
+            SimilarityCluster.assignment_id == assignment_id,
+            SimilarityCluster.cluster <= clusters_shown,
+        ).order_by(SimilarityCluster.cluster, User.name)
+        for number, submission_id, name in members:
+            clusters.setdefault(number, []).append({"submission_id": submission_id, "name": name})
+
+        if submission_ids:
+            closest = db.session.query(
+                SimilarityNeighbour.submission_id, SimilarityNeighbour.neighbour_id,
+                SimilarityNeighbour.similarity, User.name,
+            ).join(
+                Submission, Submission.id == SimilarityNeighbour.neighbour_id
+            ).join(
+                User, User.id == Submission.student_id
+            ).filter(
+                SimilarityNeighbour.submission_id.in_(submission_ids),
+                SimilarityNeighbour.rank <= neighbours_shown,
+            ).order_by(SimilarityNeighbour.submission_id, SimilarityNeighbour.rank)
+            for submission_id, neighbour_id, similarity, name in closest:
+                matches.setdefault(submission_id, []).append(
+                    {"submission_id": neighbour_id, "name": name, "similarity": similarity}
+                )
+
+    return {
+        "report": report,
+        "current": report is not None and report.data_version == current_versions([scope])[scope],
+        "pending": pending,
+        "clusters": sorted(clusters.items()),
+        "matches": matches,
+    }
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import tempfile
+import time
+
+from models import db, Blob
+
+
+# Content-addressed upload store.
+#
+# Uploads are streamed in chunks to a temporary file while their SHA-256 is
+# computed, then moved to blobs/<sha[:2]>/<sha> under UPLOAD_FOLDER. Identical
+# files are stored once; the blobs table counts how many submissions point at
+# each one, and collect_garbage() removes blobs nobody references any more.
+#
+# The reference is taken (and the row write-locked) before the file is moved
+# into place, so a concurrent garbage collection either finishes first or sees
+# the new reference and leaves the blob alone.
+
+BLOB_DIR = "blobs"
+TMP_DIR = "tmp"
+
+
+def blob_key(sha256):
+    """Path of a blob relative to UPLOAD_FOLDER, as used in proxy redirects."""
+    return f"{BLOB_DIR}/{sha256[:2]}/{sha256}"
+
+
+def blob_path(upload_folder, sha256):
+    return os.path.join(upload_folder, *blob_key(sha256).split("/"))
+
+
+def _acquire(sha256, size):
+    updated = Blob.query.filter_by(sha256=sha256).update(
+        {Blob.refcount: Blob.refcount + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.session.add(Blob(sha256=sha256, size=size, refcount=1))
+    db.session.flush()
+
+
+def release_blob(sha256):
+    if sha256:
+        Blob.query.filter_by(sha256=sha256).update(
+            {Blob.refcount: Blob.refcount - 1}, synchronize_session=False
+        )
+
+
+def store_upload(file_storage, upload_folder, chunk_size=64 * 1024):
+    """Stream an uploaded file into the store and take a reference to it.
+
+    Returns the blob's SHA-256. The caller owns the reference and must commit
+    (or roll back, leaving at worst an orphan file for collect_garbage).
+    """
+    tmp_dir = os.path.join(upload_folder, TMP_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = file_storage.stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+
+        sha256 = digest.hexdigest()
+        _acquire(sha256, size)
+
+        target = blob_path(upload_folder, sha256)
+        if os.path.exists(target):
+            os.remove(tmp_path)
+            os.utime(target)  # keep a just-reused file out of the orphan sweep
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return sha256
+
+
+def collect_garbage(upload_folder, grace_seconds=3600):
+    """Delete unreferenced blobs and stray files. Returns (blobs, bytes) reclaimed."""
+    removed = 0
+    reclaimed = 0
+
+    unreferenced = [row.sha256 for row in db.session.query(Blob.sha256).filter(Blob.refcount <= 0)]
+    for sha256 in unreferenced:
+        # Compare-and-delete so a reference taken since the SELECT wins.
+        deleted = Blob.query.filter(Blob.sha256 == sha256, Blob.refcount <= 0).delete(
+            synchronize_session=False
+        )
+        if deleted:
+            path = blob_path(upload_folder, sha256)
+            if os.path.exists(path):
+                reclaimed += os.path.getsize(path)
+                os.remove(path)
+            removed += 1
+        db.session.commit()
+
+    # Files left behind by rolled-back or interrupted uploads.
+    cutoff = time.time() - grace_seconds
+    known = {row.sha256 for row in db.session.query(Blob.sha256)}
+    for root, _dirs, files in os.walk(os.path.join(upload_folder, BLOB_DIR)):
+        for name in files:
+            path = os.path.join(root, name)
+            if name not in known and os.path.getmtime(path) < cutoff:
+                reclaimed += os.path.getsize(path)
+                os.remove(path)
+                removed += 1
+    for root, _dirs, files in os.walk(os.path.join(upload_folder, TMP_DIR)):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+
+    return removed, reclaimed
+
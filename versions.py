@@ -0,0 +1,105 @@
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from database import upsert
+from models import db, Assignment, Submission, Feedback, DataVersion
+
+
+# Data versions for cache invalidation.
+#
+# Every scope ("assignments", "teacher:<id>", "student:<id>", "assignment:<id>")
+# has a counter in data_versions that is bumped, in the same transaction,
+# whenever a row the scope depends on is flushed:
+#
+#   Assignment  -> "assignments", "teacher:<owner>"
+#   Submission  -> "student:<student>", "teacher:<assignment owner>",
+#                  "assignment:<assignment>" (only when its text is added,
+#                  changed or removed; see similarity.py)
+#   Feedback    -> "student:<student>", "teacher:<grader>"
+#
+# Cached content is keyed by the versions of the scopes it was built from, so
+# it is never served after a commit that changed it. Bulk Core statements
+# (insert(Model), update(Model)) bypass the session and must call
+# bump_versions() themselves.
+
+GLOBAL_ASSIGNMENTS = "assignments"
+
+
+def teacher_scope(teacher_id):
+    return f"teacher:{teacher_id}"
+
+
+def student_scope(student_id):
+    return f"student:{student_id}"
+
+
+def assignment_scope(assignment_id):
+    return f"assignment:{assignment_id}"
+
+
+def current_versions(scopes):
+    """Return {scope: version} for scopes, with 0 for scopes never bumped."""
+    scopes = list(scopes)
+    versions = dict.fromkeys(scopes, 0)
+    rows = db.session.execute(
+        select(DataVersion.scope, DataVersion.version).where(DataVersion.scope.in_(scopes))
+    )
+    versions.update((scope, version) for scope, version in rows)
+    return versions
+
+
+def bump_versions(scopes, session=None):
+    session = session or db.session
+    scopes = sorted(set(scopes))
+    if not scopes:
+        return
+    # One upsert, so concurrent first bumps of a scope cannot collide.
+    rows = [{"scope": scope, "version": 1} for scope in scopes]
+    upsert(session, DataVersion, DataVersion.scope, rows, add=("version",))
+
+
+def _text_changed(submission):
+    attrs = inspect(submission).attrs
+    return attrs.text_response.history.has_changes() or attrs.assignment_id.history.has_changes()
+
+
+def _changed_scopes(session):
+    scopes = set()
+    assignment_ids = set()
+    submission_ids = set()
+
+    objects = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty if session.is_modified(obj, include_collections=False)
+    ]
+    for obj in objects:
+        if isinstance(obj, Assignment):
+            scopes.add(GLOBAL_ASSIGNMENTS)
+            scopes.add(teacher_scope(obj.teacher_id))
+        elif isinstance(obj, Submission):
+            scopes.add(student_scope(obj.student_id))
+            assignment_ids.add(obj.assignment_id)
+            if obj in session.new or obj in session.deleted or _text_changed(obj):
+                scopes.add(assignment_scope(obj.assignment_id))
+                scopes.update(assignment_scope(old) for old in inspect(obj).attrs.assignment_id.history.deleted)
+        elif isinstance(obj, Feedback):
+            scopes.add(teacher_scope(obj.teacher_id))
+            submission_ids.add(obj.submission_id)
+
+    assignment_ids.discard(None)
+    submission_ids.discard(None)
+    if assignment_ids:
+        owners = session.execute(select(Assignment.teacher_id).where(Assignment.id.in_(assignment_ids)))
+        scopes.update(teacher_scope(teacher_id) for teacher_id in owners.scalars())
+    if submission_ids:
+        students = session.execute(select(Submission.student_id).where(Submission.id.in_(submission_ids)))
+        scopes.update(student_scope(student_id) for student_id in students.scalars())
+    scopes.discard(teacher_scope(None))
+    scopes.discard(student_scope(None))
+    scopes.discard(assignment_scope(None))
+    return scopes
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_changed_versions(session, flush_context, instances):
+    with session.no_autoflush:
+        bump_versions(_changed_scopes(session), session=session)
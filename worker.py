@@ -0,0 +1,140 @@
+import argparse
+import threading
+import time
+import traceback
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from flask import current_app
+
+from app import create_app
+from models import db
+import jobs
+from metrics import render_metrics
+from plagiarism import process_submission, rebuild_index
+from roster import discard_roster_upload, run_roster_import
+from similarity import compute_similarity
+
+
+# Background worker entry point:
+#
+#     python worker.py --concurrency 4
+#
+# Runs queued jobs (see jobs.py) until interrupted. Each thread has its own
+# app context and therefore its own database session.
+
+def similarity_report(assignment_id):
+    config = current_app.config
+    compute_similarity(assignment_id, config["SIMILARITY_TOP_K"], config["SIMILARITY_CLUSTER_PERCENT"])
+
+
+def roster_import(import_id):
+    config = current_app.config
+    run_roster_import(
+        import_id, config["ROSTER_UPLOAD_FOLDER"], config["ROSTER_BATCH_SIZE"], config["ROSTER_HASH_WORKERS"],
+        config["PASSWORD_HASH_METHOD"],
+    )
+
+
+def roster_import_given_up(import_id):
+    discard_roster_upload(current_app.config["ROSTER_UPLOAD_FOLDER"], import_id)
+
+
+HANDLERS = {
+    "plagiarism": process_submission,
+    "similarity": similarity_report,
+    "roster-import": roster_import,
+    "rebuild-index": rebuild_index,
+}
+
+# Cleanup for jobs that failed JOB_MAX_ATTEMPTS times.
+GIVEN_UP_HANDLERS = {
+    "roster-import": roster_import_given_up,
+}
+
+
+def run_job(app, job, max_attempts):
+    try:
+        HANDLERS[job.kind](job.target_id)
+        db.session.commit()
+    except Exception:
+        app.logger.exception("Job %s (%s %s) failed", job.id, job.kind, job.target_id)
+        if jobs.fail(job, traceback.format_exc(), max_attempts) and job.kind in GIVEN_UP_HANDLERS:
+            GIVEN_UP_HANDLERS[job.kind](job.target_id)
+    else:
+        jobs.complete(job)
+
+
+def run_worker(app, stop, drain=False):
+    lease = app.config["JOB_LEASE_SECONDS"]
+    max_attempts = app.config["JOB_MAX_ATTEMPTS"]
+    poll_interval = app.config["JOB_POLL_INTERVAL"]
+
+    with app.app_context():
+        while not stop.is_set():
+            # Queue errors (a lock held past busy_timeout, I/O errors) must not
+            # kill the thread: log them and try again after a pause. A job left
+            # running is claimed again once its lease expires.
+            try:
+                job = jobs.claim(lease)
+                if job is None:
+                    if drain:
+                        return
+                    stop.wait(poll_interval)
+                    continue
+                run_job(app, job, max_attempts)
+            except Exception:
+                app.logger.exception("Worker error; retrying in %ss", poll_interval)
+                db.session.rollback()
+                stop.wait(poll_interval)
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port):
+    """Expose this process's metrics (plagiarism scoring time) for Prometheus."""
+    def application(environ, start_response):
+        start_response("200 OK", [("Content-Type", "text/plain; version=0.0.4")])
+        return [render_metrics().encode()]
+
+    server = make_server("", port, application, handler_class=_QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+
+def main():
+    app = create_app()
+
+    parser = argparse.ArgumentParser(description="Run background jobs.")
+    parser.add_argument(
+        "--concurrency", type=int, default=app.config["WORKER_CONCURRENCY"],
+        help="number of worker threads",
+    )
+    parser.add_argument("--drain", action="store_true", help="exit once the queue is empty")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=run_worker, args=(app, stop, args.drain), daemon=True)
+        for _ in range(max(1, args.concurrency))
+    ]
+    for t in threads:
+        t.start()
+    print(f"Worker started with {len(threads)} thread(s).")
+
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for t in threads:
+            t.join()
+
+
+if __name__ == "__main__":
+    main()